@@ -0,0 +1,161 @@
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Sequence, Union
+from fsm import Action, FSM
+from automaton import NFA, Interval, EPSILON_MOVE
+
+MAX_CODE_POINT = 0x10FFFF
+LATIN1_SIZE = 256
+# Characters above Latin-1 whose class a translation table remembers, the others are looked up every time
+MAX_TRANSLATION_CACHE = 4096
+
+# FSM actions are either a single symbol or a range of the form 'a-z'
+def action_interval(action: Action) -> Interval:
+    if len(action) == 3 and action[1] == '-':
+        return ord(action[0]), ord(action[2])
+    return ord(action), ord(action)
+
+
+class Alphabet:
+    '''
+        A partition of all code points into disjoint symbol classes.
+
+        Two characters belong to the same class when they are accepted by exactly the same set
+        of actions, so an automaton defined over class ids behaves the same as one defined over
+        raw characters. Class 0 holds every character that no action mentions.
+    '''
+    # sorted starts of the elementary intervals covering [0, MAX_CODE_POINT] and the class of each one
+    _starts: Sequence[int]
+    _ids: Sequence[int]
+    # class id of every Latin-1 character, so the common case is a single array index
+    table: Sequence[int]
+    size: int
+    _interval_classes: Dict[Interval, List[int]]
+
+    # starts, ids and table can be any int sequence, e.g. memoryviews over a mapped file
+    def __init__(self, starts: Sequence[int], ids: Sequence[int], interval_classes: Dict[Interval, List[int]] = None,
+                 size: int = None, table: Sequence[int] = None):
+        self._starts = starts
+        self._ids = ids
+        self._interval_classes = interval_classes if interval_classes is not None else {}
+        self.size = size if size is not None else max(ids) + 1
+        self.table = table if table is not None else array('i', (self._find(code) for code in range(LATIN1_SIZE)))
+        self._intervals = None
+        self._translation = None
+
+    @classmethod
+    def from_intervals(cls, intervals: Iterable[Interval]) -> 'Alphabet':
+        '''
+            1. collect the boundaries of every interval
+            2. sweep the elementary intervals between consecutive boundaries,
+               keeping the set of intervals that are open at each boundary
+            3. give the same class to elementary intervals covered by the same set of intervals
+        '''
+        intervals = sorted(set(intervals))
+        opening, closing = {}, {}
+        for k, (low, high) in enumerate(intervals):
+            opening.setdefault(low, []).append(k)
+            closing.setdefault(high + 1, []).append(k)
+        boundaries = sorted({0} | opening.keys() | {b for b in closing if b <= MAX_CODE_POINT})
+
+        signatures = {frozenset(): 0}
+        interval_classes = {interval: set() for interval in intervals}
+        starts, ids = [], []
+        active = set()
+        for start in boundaries:
+            active.difference_update(closing.get(start, ()))
+            active.update(opening.get(start, ()))
+            signature = frozenset(active)
+            if signature not in signatures:
+                signatures[signature] = len(signatures)
+                for k in signature:
+                    interval_classes[intervals[k]].add(signatures[signature])
+            class_id = signatures[signature]
+            # merge neighbouring intervals of the same class
+            if ids and ids[-1] == class_id:
+                continue
+            starts.append(start)
+            ids.append(class_id)
+
+        return cls(starts, ids, {interval: sorted(c) for interval, c in interval_classes.items()})
+
+    @classmethod
+    def from_actions(cls, actions: Iterable[Action]) -> 'Alphabet':
+        return cls.from_intervals(action_interval(action) for action in actions)
+
+    @classmethod
+    def from_nfa(cls, nfa: NFA) -> 'Alphabet':
+        return cls.from_intervals(nfa.intervals())
+
+    @classmethod
+    def from_fsm(cls, fsm: FSM) -> 'Alphabet':
+        return cls.from_actions(
+            action for transitions in fsm._states.values() for action in transitions if action != EPSILON_MOVE)
+
+    def _find(self, code: int) -> int:
+        return self._ids[bisect_right(self._starts, code) - 1]
+
+    def lookup(self, char: str) -> int:
+        code = ord(char)
+        if code < LATIN1_SIZE:
+            return self.table[code]
+        return self._find(code)
+
+    def classify(self, chunk: Union[str, bytes]) -> Sequence[int]:
+        '''
+            Class id of every character of a str, or of every byte of a bytes-like object
+            (a byte b is the character chr(b), i.e. bytes are read as Latin-1).
+            With at most 256 classes the whole chunk is translated by str/bytes.translate.
+        '''
+        if self.size > LATIN1_SIZE:
+            if isinstance(chunk, str):
+                return [self.lookup(char) for char in chunk]
+            return [self.table[byte] for byte in chunk]
+        if self._translation is None:
+            self._translation = _ClassTranslation(self)
+        if isinstance(chunk, str):
+            return chunk.translate(self._translation).encode('latin-1')
+        return bytes(chunk).translate(self._translation.byte_table)
+
+    # Classes of an action of the pattern, or of any action made of whole classes (see actions)
+    def classes_of(self, action: Action) -> List[int]:
+        return self.classes_of_interval(action_interval(action))
+
+    def classes_of_interval(self, interval: Interval) -> List[int]:
+        classes = self._interval_classes.get(interval)
+        if classes is None:
+            low, high = interval
+            first, last = bisect_right(self._starts, low) - 1, bisect_right(self._starts, high) - 1
+            classes = sorted({self._ids[i] for i in range(first, last + 1)})
+            self._interval_classes[interval] = classes
+        return classes
+
+    def intervals(self, class_id: int) -> List[Interval]:
+        if self._intervals is None:
+            self._intervals = [[] for _ in range(self.size)]
+            for i, start in enumerate(self._starts):
+                end = self._starts[i+1] - 1 if i+1 < len(self._starts) else MAX_CODE_POINT
+                self._intervals[self._ids[i]].append((start, end))
+        return self._intervals[class_id]
+
+    # The actions covering a class, one per interval, used when converting back to an FSM
+    def actions(self, class_id: int) -> List[Action]:
+        return [chr(low) if low == high else f'{chr(low)}-{chr(high)}' for low, high in self.intervals(class_id)]
+
+
+class _ClassTranslation(dict):
+    '''
+        str.translate table mapping every character to chr(class id). Characters above Latin-1 are added
+        on first use, up to MAX_TRANSLATION_CACHE of them, so text with many distinct characters
+        does not grow the table without bound
+    '''
+    def __init__(self, alphabet: Alphabet):
+        super().__init__((code, chr(alphabet.table[code])) for code in range(LATIN1_SIZE))
+        self.alphabet = alphabet
+        self.byte_table = bytes(alphabet.table[code] for code in range(LATIN1_SIZE))
+
+    def __missing__(self, code: int) -> str:
+        class_char = chr(self.alphabet._find(code))
+        if len(self) < LATIN1_SIZE + MAX_TRANSLATION_CACHE:
+            self[code] = class_char
+        return class_char
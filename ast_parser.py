@@ -0,0 +1,80 @@
+from typing import List
+from regex_ast import Node, Literal, CharSet, Concat, Alternate, Repeat, Group
+from lexer import tokenize, CHAR, SET, STAR, PLUS, QUESTION, PIPE, LPAREN, RPAREN, REPEAT
+from exceptions import ParserSyntaxError
+
+# repetition operator -> (min, max) number of repetitions
+REPETITIONS = {STAR: (0, None), PLUS: (1, None), QUESTION: (0, 1)}
+
+
+class _Group:
+    '''A parenthesized group (or the whole pattern) being parsed, index 0 when it does not capture'''
+    def __init__(self, start: int, index: int = 0):
+        self.start = start
+        self.index = index
+        self.alternatives: List[Node] = []
+        self.items: List[Node] = []
+
+    def close_alternative(self, position: int):
+        if not self.items:
+            raise ParserSyntaxError("Empty alternative", position)
+        if len(self.items) == 1:
+            self.alternatives.append(self.items[0])
+        else:
+            self.alternatives.append(Concat(tuple(self.items), (self.items[0].span[0], self.items[-1].span[1])))
+        self.items = []
+
+    def close(self, position: int, end: int) -> Node:
+        self.close_alternative(position)
+        if len(self.alternatives) == 1:
+            node = self.alternatives[0]
+        else:
+            node = Alternate(tuple(self.alternatives), (self.start, end))
+        return Group(node, self.index, (self.start, end)) if self.index else node
+
+
+class AstParser:
+    '''
+        Builds the syntax tree of a pattern from its tokens in one pass, without recursion:
+            1. an open group is kept on a stack with its finished alternatives and the items
+               of the alternative being read
+            2. characters and sets are appended to the items, a repetition operator or count wraps the last item
+            3. '|' closes the current alternative, ')' closes the group and appends it to the enclosing one;
+               capturing groups are numbered by their '(' from left to right, as in re
+        Precedence follows from the structure: repetition binds to one item, concatenation joins items,
+        alternation joins alternatives.
+    '''
+    def parse(self, pattern: str) -> Node:
+        groups = [_Group(0)]
+        n_captures = 0
+        for token in tokenize(pattern):
+            group = groups[-1]
+            if token.kind == CHAR:
+                group.items.append(Literal(token.value, (token.start, token.end)))
+            elif token.kind == SET:
+                group.items.append(CharSet(token.value, (token.start, token.end)))
+            elif token.kind in REPETITIONS or token.kind == REPEAT:
+                if not group.items:
+                    raise ParserSyntaxError("Nothing to repeat", token.start)
+                node = group.items[-1]
+                low, high = token.value if token.kind == REPEAT else REPETITIONS[token.kind]
+                group.items[-1] = Repeat(node, low, high, (node.span[0], token.end))
+            elif token.kind == PIPE:
+                group.close_alternative(token.start)
+            elif token.kind == LPAREN:
+                n_captures += token.value
+                groups.append(_Group(token.start, n_captures if token.value else 0))
+            elif token.kind == RPAREN:
+                if len(groups) == 1:
+                    raise ParserSyntaxError("Unmatched parenthesis", token.start)
+                groups.pop()
+                if not group.items and not group.alternatives:
+                    raise ParserSyntaxError("Empty group", group.start)
+                groups[-1].items.append(group.close(token.start, token.end))
+
+        if len(groups) > 1:
+            raise ParserSyntaxError("Unmatched parenthesis", groups[-1].start)
+        root = groups[0]
+        if not root.items and not root.alternatives:
+            raise ParserSyntaxError("Empty regex", 0)
+        return root.close(len(pattern), len(pattern))
@@ -0,0 +1,125 @@
+import asyncio
+import codecs
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional
+from dfa_table import DFATable
+from engine import Engine, bounds
+from match import Match
+from stream import StreamMatcher, Chunk, Span, iter_chunks, DEFAULT_CHUNK_SIZE
+
+# characters scanned between two yields to the event loop
+DEFAULT_STEP_BUDGET = 1 << 12
+
+
+async def aiter_chunks(source, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[Chunk]:
+    '''
+        Chunks of at most chunk_size of an asyncio.StreamReader (or anything with a coroutine read method),
+        of an async iterable of str/bytes chunks, or of any source iter_chunks accepts
+    '''
+    # a StreamReader is also async iterable, but by lines: a long line without a newline would overflow its limit
+    if hasattr(source, 'read') and asyncio.iscoroutinefunction(source.read):
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk: return
+            yield chunk
+    elif hasattr(source, '__aiter__'):
+        async for chunk in source:
+            yield chunk
+    else:
+        for chunk in iter_chunks(source, chunk_size):
+            yield chunk
+
+
+async def _feed(matcher: StreamMatcher, chunk: Chunk, step_budget: int, executor: Optional[Executor]) -> List[Span]:
+    '''Feeds a chunk in slices of step_budget characters, giving the event loop a turn after each one'''
+    if executor is not None and len(chunk) > step_budget:
+        # the matcher is shared with the executor, so it has to be a thread pool
+        return await asyncio.get_running_loop().run_in_executor(executor, matcher.feed, chunk)
+    spans = []
+    for i in range(0, len(chunk), step_budget):
+        spans.extend(matcher.feed(chunk[i:i + step_budget]))
+        await asyncio.sleep(0)
+    return spans
+
+
+def _check_executor(executor: Optional[Executor]):
+    if isinstance(executor, ProcessPoolExecutor):
+        raise ValueError("A stream matcher cannot be shared with another process, use a thread pool")
+
+
+async def afinditer_stream(table: DFATable, source, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                           encoding: Optional[str] = None, step_budget: int = DEFAULT_STEP_BUDGET,
+                           executor: Optional[Executor] = None) -> AsyncIterator[Span]:
+    '''
+        Async finditer_stream: spans of the matches in an async stream, yielded as soon as they are known.
+        At most step_budget characters are scanned between two turns of the event loop,
+        chunks larger than that are scanned in the thread pool executor instead when one is given.
+        A process pool raises ValueError: the matcher keeps its state between chunks.
+    '''
+    _check_executor(executor)
+    matcher = StreamMatcher(table)
+    decoder = codecs.getincrementaldecoder(encoding)() if encoding is not None else None
+    async for chunk in aiter_chunks(source, chunk_size):
+        if decoder is not None and not isinstance(chunk, str):
+            chunk = decoder.decode(bytes(chunk))
+        for span in await _feed(matcher, chunk, step_budget, executor):
+            yield span
+    if decoder is not None:
+        for span in await _feed(matcher, decoder.decode(b'', final=True), step_budget, executor):
+            yield span
+    for span in matcher.close():
+        yield span
+
+
+def _spans(engine: Engine, string: str, pos: int, endpos: Optional[int], first: bool) -> List[Span]:
+    if first:
+        match = engine.search(string, pos, endpos)
+        return [match.span()] if match is not None else []
+    return [match.span() for match in engine.finditer(string, pos, endpos)]
+
+def _spans_of_table(table_bytes: bytes, string: str, pos: int, endpos: Optional[int], first: bool) -> List[Span]:
+    # runs in a worker process, which gets the DFA in binary form
+    return _spans(DFATable.from_buffer(table_bytes), string, pos, endpos, first)
+
+async def _offload(engine: Engine, string: str, pos: int, endpos: Optional[int], first: bool,
+                   executor: Optional[Executor]) -> List[Span]:
+    loop = asyncio.get_running_loop()
+    if isinstance(executor, ProcessPoolExecutor):
+        if not isinstance(engine, DFATable):
+            raise ValueError("Only a compiled DFA can be sent to a process pool, use the 'dfa' engine")
+        return await loop.run_in_executor(executor, _spans_of_table, engine.to_bytes(), string, pos, endpos, first)
+    # None runs in the default thread pool of the loop
+    return await loop.run_in_executor(executor, _spans, engine, string, pos, endpos, first)
+
+
+async def afinditer(engine: Engine, string: str, pos: int = 0, endpos: Optional[int] = None,
+                    step_budget: int = DEFAULT_STEP_BUDGET, executor: Optional[Executor] = None,
+                    first: bool = False) -> AsyncIterator[Match]:
+    '''
+        Async finditer over a string in memory. A DFA is scanned in slices of step_budget characters,
+        with a turn of the event loop after each one; with an executor, or for the NFA engines which
+        cannot scan in slices, the whole scan runs in the executor (a thread or a process pool).
+        first stops at the first match, as search does.
+    '''
+    if executor is not None or not isinstance(engine, DFATable):
+        for start, end in await _offload(engine, string, pos, endpos, first, executor):
+            yield Match(string, start, end, engine.captures)
+        return
+    pos, endpos = bounds(string, pos, endpos)
+    if pos > endpos: return
+    matcher = StreamMatcher(engine)
+    for i in range(pos, endpos, step_budget):
+        for start, end in matcher.feed(string[i:min(i + step_budget, endpos)]):
+            yield Match(string, pos + start, pos + end, engine.captures)
+            if first: return
+        await asyncio.sleep(0)
+    for start, end in matcher.close():
+        yield Match(string, pos + start, pos + end, engine.captures)
+        if first: return
+
+
+async def asearch(engine: Engine, string: str, pos: int = 0, endpos: Optional[int] = None,
+                  step_budget: int = DEFAULT_STEP_BUDGET, executor: Optional[Executor] = None) -> Optional[Match]:
+    async for match in afinditer(engine, string, pos, endpos, step_budget, executor, first=True):
+        return match
+    return None
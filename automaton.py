@@ -0,0 +1,204 @@
+from array import array
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Set, Tuple
+from fsm import FSM, State
+
+EPSILON_MOVE = 'ε'
+
+# inclusive range of code points
+Interval = Tuple[int, int]
+# (states, moves, epsilon moves) of an NFABuilder at some point of the construction
+Mark = Tuple[int, int, int]
+
+
+def _csr(n_states: int, sources: array, *columns: array) -> Tuple[array, ...]:
+    '''Sorts edges by source (counting sort): returns the offsets and every column in source order'''
+    offsets = array('i', [0]) * (n_states + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(n_states):
+        offsets[i + 1] += offsets[i]
+    filled = array('i', offsets)
+    sorted_columns = [array('i', [0]) * len(sources) for _ in columns]
+    for edge, source in enumerate(sources):
+        slot = filled[source]
+        filled[source] += 1
+        for column, sorted_column in zip(columns, sorted_columns):
+            sorted_column[slot] = column[edge]
+    return (offsets, *sorted_columns)
+
+
+class NFA:
+    '''
+        NFA over integer states 0..n_states-1, stored in flat arrays.
+
+        The symbol moves of state s are the edges move_offsets[s]..move_offsets[s+1]-1: edge i
+        goes to move_destinations[i] on any code point in [move_low[i], move_high[i]].
+        Epsilon moves are kept apart in the same layout, so stages that only follow
+        epsilon moves (closures) never look at symbol moves and the other way around.
+    '''
+    __slots__ = ('n_states', 'initial', 'accepting',
+                 'move_offsets', 'move_low', 'move_high', 'move_destinations',
+                 'epsilon_offsets', 'epsilon_destinations')
+
+    n_states: int
+    initial: int
+    # accepting[s] is 1 when s is an acceptance state
+    accepting: bytearray
+
+    def __init__(self, n_states: int, initial: int, accepting: bytearray,
+                 move_offsets: array, move_low: array, move_high: array, move_destinations: array,
+                 epsilon_offsets: array, epsilon_destinations: array):
+        self.n_states = n_states
+        self.initial = initial
+        self.accepting = accepting
+        self.move_offsets = move_offsets
+        self.move_low = move_low
+        self.move_high = move_high
+        self.move_destinations = move_destinations
+        self.epsilon_offsets = epsilon_offsets
+        self.epsilon_destinations = epsilon_destinations
+
+    # (low, high, destination) of every symbol move leaving the state
+    def moves(self, state: int) -> Iterator[Tuple[int, int, int]]:
+        begin, end = self.move_offsets[state], self.move_offsets[state + 1]
+        return zip(self.move_low[begin:end], self.move_high[begin:end], self.move_destinations[begin:end])
+
+    def epsilon(self, state: int) -> Sequence[int]:
+        return self.epsilon_destinations[self.epsilon_offsets[state]:self.epsilon_offsets[state + 1]]
+
+    @property
+    def n_transitions(self) -> int:
+        return len(self.move_destinations) + len(self.epsilon_destinations)
+
+    # Size of the arrays, the memory estimate checked against CompileLimits.memory_bytes
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.move_offsets, self.move_low, self.move_high, self.move_destinations,
+                  self.epsilon_offsets, self.epsilon_destinations)
+        return len(self.accepting) + sum(len(values) * values.itemsize for values in arrays)
+
+    # Every interval a move is defined on, the input of Alphabet.from_intervals
+    def intervals(self) -> Set[Interval]:
+        return set(zip(self.move_low, self.move_high))
+
+    def reversed(self) -> 'NFA':
+        '''
+            NFA of the reversed language: every edge is turned around, a new initial state has
+            epsilon moves to the acceptance states and the initial state is the only acceptance state.
+            The states of the NFA keep their numbers, the new initial state is n_states.
+        '''
+        builder = NFABuilder()
+        for _ in range(self.n_states + 1):
+            builder.add_state()
+        for state in range(self.n_states):
+            for low, high, destination in self.moves(state):
+                builder.add_move(destination, state, low, high)
+            for destination in self.epsilon(state):
+                builder.add_epsilon(destination, state)
+            if self.accepting[state]:
+                builder.add_epsilon(self.n_states, state)
+        return builder.build(self.n_states, [self.initial])
+
+    def to_fsm(self) -> FSM:
+        '''View of the NFA as an FSM (e.g. for visualize or to_json), state s is named S{s}'''
+        fsm = FSM()
+        states = [State(f'S{state}') for state in range(self.n_states)]
+        for state in states:
+            fsm.add_state(state)
+        fsm.initial_state = states[self.initial]
+        for state in range(self.n_states):
+            if self.accepting[state]:
+                fsm.set_acceptance(states[state])
+            for low, high, destination in self.moves(state):
+                action = chr(low) if low == high else f'{chr(low)}-{chr(high)}'
+                fsm.add_transition(states[state], states[destination], action)
+            for destination in self.epsilon(state):
+                fsm.add_transition(states[state], states[destination], EPSILON_MOVE)
+        return fsm
+
+
+class NFABuilder:
+    '''
+        Collects states and edges in append-only arrays; build() lays them out as an NFA.
+        Thompson's construction writes every fragment into the same builder, so combining
+        fragments only adds edges; only counted repetition copies states, with copy().
+        tags maps the states that open or close a capturing group to their capture slot.
+    '''
+    __slots__ = ('n_states', 'tags', '_move_sources', '_move_low', '_move_high', '_move_destinations',
+                 '_epsilon_sources', '_epsilon_destinations')
+
+    def __init__(self):
+        self.n_states = 0
+        self.tags: Dict[int, int] = {}
+        self._move_sources, self._move_destinations = array('i'), array('i')
+        self._move_low, self._move_high = array('i'), array('i')
+        self._epsilon_sources, self._epsilon_destinations = array('i'), array('i')
+
+    def add_state(self) -> int:
+        self.n_states += 1
+        return self.n_states - 1
+
+    def add_move(self, source: int, destination: int, low: int, high: int):
+        self._move_sources.append(source)
+        self._move_destinations.append(destination)
+        self._move_low.append(low)
+        self._move_high.append(high)
+
+    def add_epsilon(self, source: int, destination: int):
+        self._epsilon_sources.append(source)
+        self._epsilon_destinations.append(destination)
+
+    # Sizes of the builder so far; the states and edges added after it are one fragment
+    def mark(self) -> Mark:
+        return self.n_states, len(self._move_sources), len(self._epsilon_sources)
+
+    # Drop the states and edges added since mark
+    def rollback(self, mark: Mark):
+        self.n_states, moves, epsilons = mark
+        for state in [state for state in self.tags if state >= self.n_states]:
+            del self.tags[state]
+        for edges in (self._move_sources, self._move_destinations, self._move_low, self._move_high):
+            del edges[moves:]
+        del self._epsilon_sources[epsilons:], self._epsilon_destinations[epsilons:]
+
+    # Whether any edge added between begin and end leads to state
+    def has_incoming(self, state: int, begin: Mark, end: Mark) -> bool:
+        return (state in self._move_destinations[begin[1]:end[1]]
+                or state in self._epsilon_destinations[begin[2]:end[2]])
+
+    def copy(self, begin: Mark, end: Mark, initial: int, acceptance: int, start: Optional[int] = None) -> Tuple[int, int]:
+        '''
+            Adds a copy of the fragment from initial to acceptance whose states and edges were added
+            between begin and end, returns the initial and acceptance state of the copy.
+            With start, the copy shares that existing state instead of a new initial state, which is
+            only correct when nothing in the fragment leads back to initial.
+        '''
+        first, moves, epsilons = begin
+        ids = array('i', bytes(4 * (end[0] - first)))
+        next_state = self.n_states
+        for i in range(end[0] - first):
+            if start is not None and i == initial - first:
+                ids[i] = start
+            else:
+                ids[i] = next_state
+                next_state += 1
+        self.n_states = next_state
+        for i in range(moves, end[1]):
+            self.add_move(ids[self._move_sources[i] - first], ids[self._move_destinations[i] - first],
+                          self._move_low[i], self._move_high[i])
+        for i in range(epsilons, end[2]):
+            self.add_epsilon(ids[self._epsilon_sources[i] - first], ids[self._epsilon_destinations[i] - first])
+        for state, tag in list(self.tags.items()):
+            if first <= state < end[0]:
+                self.tags[ids[state - first]] = tag
+        return ids[initial - first], ids[acceptance - first]
+
+    def build(self, initial: int, accepting: Iterable[int]) -> NFA:
+        flags = bytearray(self.n_states)
+        for state in accepting:
+            flags[state] = 1
+        move_offsets, move_low, move_high, move_destinations = _csr(
+            self.n_states, self._move_sources, self._move_low, self._move_high, self._move_destinations)
+        epsilon_offsets, epsilon_destinations = _csr(self.n_states, self._epsilon_sources, self._epsilon_destinations)
+        return NFA(self.n_states, initial, flags, move_offsets, move_low, move_high, move_destinations,
+                   epsilon_offsets, epsilon_destinations)
@@ -0,0 +1,109 @@
+from typing import Iterable, List, Sequence
+from dfa_table import DFATable
+from engine import Engine
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the batch functions then return lists of bools
+    np = None
+
+
+def fullmatch_many(engine: Engine, strings: Iterable[str]):
+    '''
+        Whether each string matches the pattern as a whole: a NumPy bool array when NumPy is
+        installed, a list of bools otherwise
+    '''
+    return _run_many(engine, strings, full=True)
+
+
+def match_many(engine: Engine, strings: Iterable[str]):
+    '''Whether a match starts at the beginning of each string, as a NumPy bool array or a list of bools'''
+    return _run_many(engine, strings, full=False)
+
+
+def _run_many(engine: Engine, strings: Iterable[str], full: bool):
+    strings = strings if isinstance(strings, list) else list(strings)
+    if not isinstance(engine, DFATable):
+        matcher = engine.fullmatch if full else engine.match
+        mask = [matcher(string) is not None for string in strings]
+        return np.array(mask, dtype=bool) if np is not None else mask
+    if np is not None:
+        return _run_numpy(engine, strings, full)
+    return _run_python(engine, strings, full)
+
+
+def _class_ids(table: DFATable, strings: List[str]) -> Sequence[int]:
+    # one translate over all the strings instead of one call per string
+    return table.alphabet.classify(''.join(strings))
+
+
+def _run_numpy(table: DFATable, strings: List[str], full: bool):
+    '''
+        algorithm (the whole batch moves one character position at a time):
+            1. the class ids of all strings are concatenated, offsets[k] is where string k starts
+            2. active holds the strings still running and states their current DFA states
+            3. at position t the strings that ended (fullmatch) or reached an accepting state (match)
+               get their result and leave the batch
+            4. every active string takes its t-th class id and its next state with two gathers,
+               strings in the dead state leave the batch
+    '''
+    n = len(strings)
+    result = np.zeros(n, dtype=bool)
+    if n == 0: return result
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=n)
+    offsets = np.zeros(n, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    classes = _class_ids(table, strings)
+    classes = np.frombuffer(classes, dtype=np.uint8) if isinstance(classes, bytes) else np.array(classes, dtype=np.int64)
+    transitions = np.frombuffer(table.transitions, dtype=np.intc)
+    accepting = np.frombuffer(bytes(table.accepting), dtype=np.uint8).astype(bool)
+    n_classes = table.n_classes
+
+    active = np.arange(n)
+    states = np.full(n, table.start, dtype=np.int64)
+    t = 0
+    while active.size:
+        if full:
+            ended = lengths[active] == t
+            result[active[ended]] = accepting[states[ended]]
+            running = ~ended
+        else:
+            accepted = accepting[states]
+            result[active[accepted]] = True
+            running = ~accepted & (lengths[active] > t)
+        active, states = active[running], states[running]
+        if not active.size: break
+
+        states = transitions[states * n_classes + classes[offsets[active] + t]].astype(np.int64)
+        alive = states != table.DEAD_STATE
+        active, states = active[alive], states[alive]
+        t += 1
+    return result
+
+
+def _run_python(table: DFATable, strings: List[str], full: bool) -> List[bool]:
+    transitions, accepting, n_classes = table.transitions, table.accepting, table.n_classes
+    dead, start = table.DEAD_STATE, table.start
+    classes = _class_ids(table, strings)
+
+    result = []
+    offset = 0
+    for string in strings:
+        i, end = offset, offset + len(string)
+        state = start
+        if full:
+            while i < end and state != dead:
+                state = transitions[state * n_classes + classes[i]]
+                i += 1
+            # the dead state is not accepting
+            result.append(bool(accepting[state]))
+        else:
+            matched = accepting[state]
+            while not matched and i < end:
+                state = transitions[state * n_classes + classes[i]]
+                if state == dead: break
+                matched = accepting[state]
+                i += 1
+            result.append(bool(matched))
+        offset = end
+    return result
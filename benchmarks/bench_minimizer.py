@@ -0,0 +1,86 @@
+'''
+    Scaling of Minimizer vs HopcroftMinimizer on large DFAs, printing the number of states
+    each one leaves and the time it takes.
+
+    random: a random minimal DFA with `size / copies` states blown up into `size` states by
+            duplicating every state, so both minimizers have to merge the copies back together.
+    chain:  the DFA of a literal of `size` characters, every refinement round splits off one state.
+
+        python benchmarks/bench_minimizer.py [--family random|chain] [--sizes 1000 10000] [--partition-max 2000]
+'''
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alphabet import Alphabet
+from dfa_table import DFATable
+from hopcroft import HopcroftMinimizer
+from minimizer import Minimizer
+
+def random_table(size: int, copies: int, classes: int, seed: int = 0) -> DFATable:
+    rng = random.Random(seed)
+    alphabet = Alphabet.from_actions(chr(ord('a') + c) for c in range(classes - 1))
+    minimal = max(2, size // copies)
+    # state 0 is dead, the copies of minimal state m are m, m + minimal, m + 2*minimal, ...
+    rows = [[rng.randrange(1, minimal) for _ in range(alphabet.size)] for _ in range(minimal)]
+    accepting_minimal = [rng.random() < 0.3 for _ in range(minimal)]
+    rows[0] = [0] * alphabet.size
+    accepting_minimal[0] = False
+
+    n = minimal * copies
+    transitions = array('i', [0]) * (n * alphabet.size)
+    accepting = bytearray(n)
+    for state in range(n):
+        original = state % minimal
+        accepting[state] = accepting_minimal[original]
+        for c in range(alphabet.size):
+            target = rows[original][c]
+            transitions[state * alphabet.size + c] = 0 if target == 0 else target + minimal * rng.randrange(copies)
+        # class 0 (symbols no action mentions) always leads to the dead state
+        transitions[state * alphabet.size] = 0
+    return DFATable(alphabet, transitions, accepting, 1)
+
+def chain_table(size: int) -> DFATable:
+    alphabet = Alphabet.from_actions('a')
+    transitions = array('i', [0]) * (size * alphabet.size)
+    for state in range(1, size - 1):
+        transitions[state * alphabet.size + alphabet.lookup('a')] = state + 1
+    accepting = bytearray(size)
+    accepting[size - 1] = 1
+    return DFATable(alphabet, transitions, accepting, 1)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--family', choices=['random', 'chain'], default='random')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 5000, 10000, 20000])
+    parser.add_argument('--copies', type=int, default=4)
+    parser.add_argument('--classes', type=int, default=8)
+    parser.add_argument('--partition-max', type=int, default=2000, help="largest DFA given to Minimizer")
+    args = parser.parse_args()
+
+    print(f"{'states':>8} {'hopcroft':>9} {'seconds':>8} {'partition':>10} {'seconds':>8}")
+    for size in args.sizes:
+        if args.family == 'random':
+            table = random_table(size, args.copies, args.classes)
+        else:
+            table = chain_table(size)
+        minimized, hopcroft_time = timed(HopcroftMinimizer().minimize, table)
+
+        partition_states, partition_time = '-', '-'
+        if table.n_states <= args.partition_max:
+            partitioned, seconds = timed(Minimizer().execute, table)
+            partition_states, partition_time = partitioned.n_states, f'{seconds:.3f}'
+        print(f'{table.n_states:>8} {minimized.n_states:>9} {hopcroft_time:>8.3f} {partition_states:>10} {partition_time:>8}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+'''
+    Compile time per stage and matching throughput over pattern families, with Python's re as a reference.
+
+    literal:      a literal with a few digits, found with the prefilter
+    alternation:  a wide alternation of words
+    nested_star:  stars nested in stars
+    ranges:       character ranges and repeated sets
+    exponential:  [ab]*a[ab]...[ab], whose DFA doubles with every [ab]
+    counted:      counted repetitions, [A-Z][a-z]{2,30}[0-9]{2,8}
+    long_count:   counts in the hundreds, x(ab|cd){200,400}y, whose DFA is a chain of ~1000 states
+
+    Every measurement is the best of --repeat runs, in seconds, saved under a key such as
+    'compile/alternation/subset_construction', 'match/ranges/100000' or 're/ranges/100000'.
+    The bytes of the NFA and the estimated bytes of the DFA under construction are saved as
+    'memory/counted/nfa' and 'memory/counted/dfa'.
+    With --baseline the results are compared with an earlier run on the same machine: a compile stage,
+    match or memory more than --threshold larger is a regression and the exit status is 1. re keys are
+    only a reference and never fail.
+
+        python benchmarks/bench_suite.py [--sizes 10000 100000] [--output results.json] [--baseline baseline.json]
+'''
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Union
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_parser import RegexParser, COMPILER_VERSION
+from options import CompileOptions
+
+FORMAT_VERSION = 1
+# stages whose regressions fail the run, next to matching
+TRACKED_STAGES = ('parse', 'simplify', 'thompson', 'alphabet', 'subset_construction', 'minimize',
+                  'reverse_subset_construction', 'reverse_minimize')
+# measurements below this are mostly timer noise and never fail
+MIN_SECONDS = 1e-3
+
+class Family(NamedTuple):
+    # the pattern in the syntax of this repo and in the syntax of re
+    pattern: str
+    re_pattern: str
+    # text of the given length with matches planted in it
+    text: Callable[[int, random.Random], str]
+
+
+def _noise(length: int, rng: random.Random, letters: str = 'abcdefghijklmnopqrstuvwxyz0123456789') -> List[str]:
+    return [rng.choice(letters) for _ in range(length)]
+
+def _plant(chars: List[str], pieces: List[str], every: int, rng: random.Random) -> str:
+    for at in range(0, len(chars) - 64, every):
+        piece = rng.choice(pieces)
+        chars[at:at + len(piece)] = piece
+    return ''.join(chars)
+
+def _words(count: int, rng: random.Random) -> List[str]:
+    return sorted({''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9)))
+                   for _ in range(count)})
+
+def families(rng: random.Random) -> Dict[str, Family]:
+    words = _words(300, rng)
+    alternation = '|'.join(words)
+    exponential = '[ab]*a' + '[ab]' * 12
+    nested_star = '(((((ab*c)*d)*e)*f)*g)*h'
+    counted = '[A-Z][a-z]{2,30}[0-9]{2,8}'
+    long_count = 'x(ab|cd){200,400}y'
+    return {
+        'literal': Family('errorcode[0-9][0-9][0-9]', 'errorcode[0-9][0-9][0-9]',
+                          lambda n, rng: _plant(_noise(n, rng), ['errorcode404', 'errorcode500'], 997, rng)),
+        'alternation': Family(alternation, alternation,
+                              lambda n, rng: _plant(_noise(n, rng), words, 101, rng)),
+        'nested_star': Family(nested_star, nested_star,
+                              lambda n, rng: ''.join(_noise(n, rng, 'abcdefgh'))),
+        'ranges': Family('[a-f0-9][a-f0-9]*x[A-Z][a-z0-9]*', '[a-f0-9][a-f0-9]*x[A-Z][a-z0-9]*',
+                         lambda n, rng: ''.join(_noise(n, rng, 'abcdef0123456789xyzXYZ'))),
+        'exponential': Family(exponential, exponential,
+                              lambda n, rng: ''.join(_noise(n, rng, 'abc'))),
+        'counted': Family(counted, counted,
+                          lambda n, rng: _plant(_noise(n, rng), ['Version2024', 'Abc12', 'Lighthouse86'], 89, rng)),
+        'long_count': Family(long_count, long_count,
+                             lambda n, rng: _plant(_noise(n, rng), ['x' + 'ab' * 250 + 'y', 'x' + 'cd' * 300 + 'y'], 997, rng)),
+    }
+
+def best(function: Callable, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def run(sizes: List[int], repeat: int, options: CompileOptions, seed: int) -> Dict[str, Union[int, float]]:
+    rng = random.Random(seed)
+    parser = RegexParser()
+    results: Dict[str, Union[int, float]] = {}
+    for name, family in families(rng).items():
+        stages: Dict[str, float] = {}
+        for _ in range(repeat):
+            _, engine, metrics = parser.compile(family.pattern, options)
+            for stage in metrics.stages:
+                stages[stage.name] = min(stage.seconds, stages.get(stage.name, stage.seconds))
+            stages['total'] = min(metrics.seconds, stages.get('total', metrics.seconds))
+        results.update((f'compile/{name}/{stage}', seconds) for stage, seconds in stages.items())
+        results[f'memory/{name}/nfa'] = metrics.stage('thompson').counters['bytes']
+        results[f'memory/{name}/dfa'] = metrics.stage('subset_construction').counters['estimated_bytes']
+        # purge, or re.compile only looks the pattern up in its cache
+        results[f're/{name}/compile'] = best(lambda: (re.purge(), re.compile(family.re_pattern)), repeat)
+
+        compiled = re.compile(family.re_pattern)
+        for size in sizes:
+            text = family.text(size, rng)
+            results[f'match/{name}/{size}'] = best(lambda: sum(1 for _ in engine.finditer(text)), repeat)
+            results[f're/{name}/{size}'] = best(lambda: sum(1 for _ in compiled.finditer(text)), repeat)
+    return results
+
+def tracked(key: str) -> bool:
+    kind, _, measure = key.split('/')
+    return kind in ('match', 'memory') or (kind == 'compile' and measure in TRACKED_STAGES)
+
+def significant(key: str, before: float, after: float) -> bool:
+    # bytes are exact, only times have a noise floor
+    return key.startswith('memory/') or max(before, after) >= MIN_SECONDS
+
+def _format(value: Union[int, float]) -> str:
+    return f'{value:>10d}' if isinstance(value, int) else f'{value:>10.5f}'
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    '''Prints every key present in both runs, returns the tracked keys that grew more than the threshold'''
+    regressions = []
+    print(f"{'measurement':<48} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for key in sorted(results.keys() & baseline.keys()):
+        before, after = baseline[key], results[key]
+        ratio = after / before if before else float('inf')
+        status = ''
+        if tracked(key) and significant(key, before, after) and ratio > 1 + threshold:
+            status = 'REGRESSION'
+            regressions.append(key)
+        print(f'{key:<48} {_format(before)} {_format(after)} {ratio:>7.2f} {status}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000], help="input lengths to match")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement, the best one is kept")
+    parser.add_argument('--minimizer', choices=('partition', 'hopcroft'), default='hopcroft')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.25, help="slowdown counted as a regression, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat, CompileOptions(minimizer=args.minimizer), args.seed)
+    report = {
+        'format_version': FORMAT_VERSION,
+        'compiler_version': COMPILER_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        for key in sorted(results):
+            print(f'{key:<48} {_format(results[key])}')
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)['results']
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
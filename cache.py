@@ -0,0 +1,132 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+from dfa_table import DFATable
+from regex_parser import COMPILER_VERSION
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class PatternCache:
+    '''
+        Thread-safe LRU cache of compiled patterns (similar to re._cache).
+        The least recently used pattern is evicted once the cache holds maxsize entries.
+    '''
+    DEFAULT_MAXSIZE = 512
+
+    _entries: 'OrderedDict[Hashable, Any]'
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, maxsize: int):
+        if maxsize < 0: raise ValueError("maxsize must be non-negative")
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._evict()
+
+    # Drop all cached patterns, counters are kept
+    def purge(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, self._maxsize, len(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    # must be called with the lock held
+    def _evict(self):
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+
+class DiskCache:
+    '''
+        Directory of compiled DFAs in the binary format of DFATable.
+        Files are keyed by a hash of the compiler version, the pattern and its options,
+        so worker processes sharing the directory start hot without recompiling.
+    '''
+    SUFFIX = '.dfa'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, pattern: str, options: Hashable) -> str:
+        key = repr((COMPILER_VERSION, pattern, options)).encode('utf-8')
+        return os.path.join(self.directory, hashlib.sha256(key).hexdigest() + self.SUFFIX)
+
+    def get(self, pattern: str, options: Hashable) -> Optional[DFATable]:
+        try:
+            return DFATable.load(self.path(pattern, options))
+        except (OSError, ValueError):
+            return None
+
+    # Written to a temporary file first, so concurrent readers never see a partial file
+    def put(self, pattern: str, options: Hashable, table: DFATable):
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(table.to_bytes())
+            os.replace(temp, self.path(pattern, options))
+        except OSError:
+            if os.path.exists(temp): os.remove(temp)
+
+
+# The caches shared by every Regex object, the disk cache is off until a directory is set
+_cache = PatternCache()
+_disk_cache: Optional[DiskCache] = None
+
+def purge():
+    _cache.purge()
+
+def cache_info() -> CacheInfo:
+    return _cache.info()
+
+def set_cache_size(maxsize: int):
+    _cache.maxsize = maxsize
+
+def set_cache_dir(directory: Optional[str]):
+    global _disk_cache
+    _disk_cache = DiskCache(directory) if directory is not None else None
+
+def disk_cache() -> Optional[DiskCache]:
+    return _disk_cache
@@ -0,0 +1,121 @@
+import time
+from typing import Dict, List, Optional, Tuple, Union
+from compact_nfa import CompactNFA
+from alphabet import LATIN1_SIZE
+from one_pass import OnePass
+from regex_ast import Node, Group, fold
+from thompson import Thompson
+from options import CompileLimits
+from exceptions import CompileLimitError
+
+# a thread of the tagged Pike VM: NFA state and capture slots
+Thread = Tuple[int, Tuple[int, ...]]
+
+
+class TaggedPikeVM:
+    '''
+        Pike VM whose threads carry capture slots, for the patterns that are not one-pass.
+        Threads are kept in priority order, so of two threads reaching the same state the first
+        one keeps it, and the captures are those re would report for the same match.
+        It only runs over a span already known to match, which keeps it linear in the span.
+    '''
+    nfa: CompactNFA
+    tags: Dict[int, int]
+    n_slots: int
+
+    def __init__(self, nfa: CompactNFA, tags: Dict[int, int], n_slots: int):
+        self.nfa = nfa
+        self.tags = tags
+        self.n_slots = n_slots
+
+    # Follow the epsilon moves from state depth first in priority order, setting the tags on the way;
+    # the threads that can move or accept are appended to threads
+    def _add_thread(self, threads: List[Thread], seen: set, state: int, slots: Tuple[int, ...], i: int):
+        nfa, tags = self.nfa, self.tags
+        stack = [(state, slots)]
+        while stack:
+            state, slots = stack.pop()
+            if state in seen: continue
+            seen.add(state)
+            tag = tags.get(state)
+            if tag is not None:
+                slots = slots[:tag] + (i,) + slots[tag + 1:]
+            if nfa.moves[state] or nfa.acceptance >> state & 1:
+                threads.append((state, slots))
+            stack.extend((next_state, slots) for next_state in reversed(nfa.epsilon[state]))
+
+    def slots(self, string: str, start: int, end: int) -> List[int]:
+        '''Capture slots of string[start:end], which must be a match of the pattern'''
+        nfa = self.nfa
+        table, lookup = nfa.alphabet.table, nfa.alphabet.lookup
+        threads: List[Thread] = []
+        self._add_thread(threads, set(), nfa.initial, (-1,) * self.n_slots, start)
+        for i in range(start, end):
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            following: List[Thread] = []
+            seen = set()
+            for state, slots in threads:
+                for next_state in nfa.moves[state].get(class_id, ()):
+                    self._add_thread(following, seen, next_state, slots, i + 1)
+            threads = following
+        for state, slots in threads:
+            if nfa.acceptance >> state & 1:
+                slots = list(slots)
+                slots[0], slots[1] = start, end
+                return slots
+        raise ValueError(f"No match at {start}:{end}")
+
+
+def _n_groups(node: Node, counts: List[int]) -> int:
+    return max([node.index if isinstance(node, Group) else 0, *counts])
+
+
+class Captures:
+    '''
+        Second phase of a match with capturing groups: the engine finds the span of the match,
+        then the captures are found by running over that span only, with the one-pass DFA
+        of the pattern when it has one, or the tagged Pike VM otherwise.
+        Both are built on first use from the syntax tree as parsed, so a search that never
+        asks for a group pays nothing for it. The build is bounded by the limits of the compile,
+        going over them raises CompileLimitError from the first group() that needs it.
+    '''
+    n_groups: int
+    _tree: Node
+    _limits: CompileLimits
+    _engine: Optional[Union[OnePass, TaggedPikeVM]] = None
+
+    def __init__(self, tree: Node, n_groups: int, limits: CompileLimits = CompileLimits()):
+        self._tree = tree
+        self.n_groups = n_groups
+        self._limits = limits
+
+    # None when the pattern has no capturing group
+    @classmethod
+    def from_tree(cls, tree: Node, limits: CompileLimits = CompileLimits()) -> Optional['Captures']:
+        n_groups = fold(tree, _n_groups)
+        return cls(tree, n_groups, limits) if n_groups else None
+
+    @property
+    def engine(self) -> Union[OnePass, TaggedPikeVM]:
+        if self._engine is None:
+            limits = self._limits
+            started = time.perf_counter()
+            thompson = Thompson(limits.nfa_states)
+            NFA = thompson.construct_NFA(self._tree)
+            if limits.nfa_states is not None and NFA.n_states > limits.nfa_states:
+                raise CompileLimitError(f"NFA exceeds {limits.nfa_states} states", 'nfa_states', NFA.n_states)
+            if limits.memory_bytes is not None and NFA.nbytes > limits.memory_bytes:
+                raise CompileLimitError(f"NFA exceeds {limits.memory_bytes} bytes", 'memory_bytes', NFA.nbytes)
+            nfa = CompactNFA(NFA)
+            if limits.seconds is not None and time.perf_counter() - started > limits.seconds:
+                raise CompileLimitError("Capture automaton ran out of time after thompson", 'seconds', 'thompson')
+            n_slots = 2 * (self.n_groups + 1)
+            engine = OnePass.build(nfa, thompson.builder.tags, n_slots)
+            # building twice in two threads is harmless, both build the same engine
+            self._engine = engine if engine is not None else TaggedPikeVM(nfa, thompson.builder.tags, n_slots)
+        return self._engine
+
+    def slots(self, string: str, start: int, end: int) -> List[int]:
+        '''[start, end, start of group 1, end of group 1, ...], -1 for a group that did not take part'''
+        return self.engine.slots(string, start, end)
@@ -0,0 +1,147 @@
+from typing import Dict, List
+from automaton import NFA
+from alphabet import Alphabet
+
+class CompactNFA:
+    '''
+        Bitset view of an NFA shared by the engines that work on the NFA directly.
+
+        A set of states is an int bitset (bit i is state i).
+        Only kernel states, i.e. states with a symbol move and acceptance states, appear in closures:
+        the other states never make two sets behave differently.
+    '''
+    alphabet: Alphabet
+    n_states: int
+    initial: int
+    acceptance: int
+    kernel: int
+    # epsilon[i]: states reached from i by one epsilon move
+    epsilon: List[List[int]]
+    # moves[i]: symbol class -> states reached from i by one move on that class
+    moves: List[Dict[int, List[int]]]
+    # closures[i]: epsilon closure of state i (kernel states only)
+    closures: List[int]
+    # closed_moves[i]: symbol class -> epsilon closure of moves[i][class]
+    closed_moves: List[Dict[int, int]]
+    # number of closures computed, one per strongly connected component of the epsilon graph
+    n_closures: int
+
+    def __init__(self, nfa: NFA, alphabet: Alphabet = None):
+        self.alphabet = alphabet if alphabet is not None else Alphabet.from_nfa(nfa)
+        self.n_states = nfa.n_states
+        self.initial = nfa.initial
+
+        self.epsilon, self.moves = [], []
+        for state in range(nfa.n_states):
+            self.epsilon.append(list(nfa.epsilon(state)))
+            moves = {}
+            for low, high, destination in nfa.moves(state):
+                for class_id in self.alphabet.classes_of_interval((low, high)):
+                    moves.setdefault(class_id, []).append(destination)
+            self.moves.append(moves)
+
+        self.acceptance = 0
+        for state in range(nfa.n_states):
+            if nfa.accepting[state]:
+                self.acceptance |= 1 << state
+        self.kernel = self.acceptance
+        for i, moves in enumerate(self.moves):
+            if moves: self.kernel |= 1 << i
+
+        self.closures = self._epsilon_closures()
+        self.closed_moves = self._closed_moves()
+
+    @property
+    def start(self) -> int:
+        return self.closures[self.initial]
+
+    def is_acceptance(self, states: int) -> bool:
+        return bool(states & self.acceptance)
+
+    # symbol class -> next set of states, for every class that leaves the set
+    def step(self, states: int) -> Dict[int, int]:
+        transition_table: Dict[int, int] = {}
+        closed_moves = self.closed_moves
+        while states:
+            lowest = states & -states
+            states ^= lowest
+            for class_id, next_states in closed_moves[lowest.bit_length() - 1].items():
+                transition_table[class_id] = transition_table.get(class_id, 0) | next_states
+        return transition_table
+
+    def step_class(self, states: int, class_id: int) -> int:
+        next_states = 0
+        closed_moves = self.closed_moves
+        while states:
+            lowest = states & -states
+            states ^= lowest
+            next_states |= closed_moves[lowest.bit_length() - 1].get(class_id, 0)
+        return next_states
+
+    def _epsilon_closures(self) -> List[int]:
+        '''
+            States on an epsilon cycle share their closure, so the epsilon graph is split into strongly
+            connected components (Tarjan). Components are completed in reverse topological order, so each
+            closure is the union of the closures of its successors, computed exactly once.
+        '''
+        successors, kernel = self.epsilon, self.kernel
+        n = self.n_states
+        closures = [0] * n
+        self.n_closures = 0
+        order, low = [-1] * n, [0] * n
+        on_stack = [False] * n
+        stack, counter = [], 0
+
+        for root in range(n):
+            if order[root] != -1: continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, 0)]
+            while work:
+                v, i = work[-1]
+                if i < len(successors[v]):
+                    work[-1] = (v, i + 1)
+                    w = successors[v][i]
+                    if order[w] == -1:
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, 0))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], order[w])
+                    continue
+
+                work.pop()
+                if work:
+                    low[work[-1][0]] = min(low[work[-1][0]], low[v])
+                if low[v] == order[v]:
+                    component, closure = [], 0
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        component.append(w)
+                        closure |= kernel & (1 << w)
+                        if w == v: break
+                    # successors inside the component still have an empty closure, so they add nothing
+                    for w in component:
+                        for x in successors[w]:
+                            closure |= closures[x]
+                    for w in component:
+                        closures[w] = closure
+                    self.n_closures += 1
+        return closures
+
+    def _closed_moves(self) -> List[Dict[int, int]]:
+        closed_moves = []
+        for moves in self.moves:
+            closed = {}
+            for class_id, destinations in moves.items():
+                reached = 0
+                for destination in destinations:
+                    reached |= self.closures[destination]
+                closed[class_id] = reached
+            closed_moves.append(closed)
+        return closed_moves
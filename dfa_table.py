@@ -0,0 +1,389 @@
+import mmap
+import struct
+import sys
+import threading
+from array import array
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+from fsm import FSM, State
+from alphabet import Alphabet, LATIN1_SIZE
+from match import Match
+from engine import Engine
+from literals import LiteralFinder
+from automaton import EPSILON_MOVE
+
+# Binary format, all integers are little-endian int32:
+#   header: magic, format version, n_intervals, n_classes, n_states, start
+#   symbol class map: interval starts[n_intervals], interval class ids[n_intervals], latin-1 table[256]
+#   transitions[n_states * n_classes]
+#   accept bitmap: ceil(n_states / 8) bytes, bit s % 8 of byte s // 8 is set if s is accepting
+#   optionally followed by the reverse table (see DFATable.reverse) in the same format
+MAGIC = b'RXDT'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4s5i')
+# Search states cached per table, the cache is flushed when it is full
+MAX_SEARCH_STATES = 10000
+
+
+class _SearchCache:
+    '''
+        The states of the leftmost-longest search automaton materialized so far, built on the fly like
+        the states of LazyDFA. A search state is a key (threads, matched): the table states of the
+        matches still in progress, from the one that started first, and whether a match was seen.
+    '''
+    UNKNOWN = -1
+
+    def __init__(self, table: 'DFATable'):
+        self.n_classes = table.n_classes
+        self.ids: Dict[Tuple[Tuple[int, ...], bool], int] = {}
+        self.keys: List[Tuple[Tuple[int, ...], bool]] = []
+        # transitions[s * n_classes + c], UNKNOWN until the input reaches it
+        self.transitions: List[int] = []
+        self.accepting = bytearray()
+        self.add(((), True), table)
+        self.start = self.add(((table.start,), False), table)
+
+    def add(self, key: Tuple[Tuple[int, ...], bool], table: 'DFATable') -> int:
+        state = len(self.keys)
+        self.ids[key] = state
+        self.keys.append(key)
+        self.transitions.extend([self.UNKNOWN] * self.n_classes)
+        self.accepting.append(any(table.accepting[s] for s in key[0]))
+        if not key[0]:
+            # no thread left: the dead state loops on itself
+            self.transitions[state * self.n_classes:] = [state] * self.n_classes
+        return state
+
+class DFATable(Engine):
+    '''
+        Dense, integer only representation of a DFA used for matching.
+
+        States are numbered 0..n_states-1 and state 0 is the dead state.
+        The transition of state s on symbol class c is transitions[s * n_classes + c].
+    '''
+    DEAD_STATE = 0
+
+    alphabet: Alphabet
+    n_states: int
+    n_classes: int
+    transitions: Sequence[int]
+    # accepting[s] is 1 if s is an acceptance state
+    accepting: bytearray
+    start: int
+    # DFA of the reversed pattern over the same symbol classes: read backwards from the end of a match,
+    # it finds where the match starts. None when it was not built, search then tries every start position
+    reverse: Optional['DFATable'] = None
+    _search_cache: Optional[_SearchCache] = None
+    # Taken to add search states or flush the cache, scans read the cache without it
+    _search_lock: threading.Lock
+
+    def __init__(self, alphabet: Alphabet, transitions: Sequence[int], accepting: bytearray, start: int):
+        self.alphabet = alphabet
+        self.n_classes = alphabet.size
+        self.n_states = len(accepting)
+        self.transitions = transitions
+        self.accepting = accepting
+        self.start = start
+        self._search_lock = threading.Lock()
+
+    @classmethod
+    def from_fsm(cls, fsm: FSM, alphabet: Alphabet = None) -> 'DFATable':
+        '''
+            Flatten an ε-free FSM into dense tables:
+                1. split the actions into disjoint symbol classes, unless the classes of the pattern are given
+                2. number the states, starting from the set containing the initial state
+                3. for each state and symbol class, find the next state
+
+            Range actions of the FSM may overlap (e.g. 'a-z' and 'a' leaving the same state),
+            so states of the table are sets of FSM states, exactly like subset construction.
+            For an FSM that is already deterministic over the classes every set has one element.
+        '''
+        alphabet = alphabet if alphabet is not None else Alphabet.from_fsm(fsm)
+        n_classes = alphabet.size
+
+        # per FSM state: class id -> destinations
+        moves: Dict[State, Dict[int, List[State]]] = {}
+        for state, transitions in fsm._states.items():
+            moves[state] = {}
+            for action, destinations in transitions.items():
+                if action == EPSILON_MOVE: continue
+                for class_id in alphabet.classes_of(action):
+                    moves[state].setdefault(class_id, []).extend(destinations)
+
+        dead: FrozenSet[State] = frozenset()
+        start = frozenset([fsm.initial_state])
+        ids = {dead: cls.DEAD_STATE, start: 1}
+        order = [dead, start]
+        transitions = array('i')
+
+        i = 0
+        while i < len(order):
+            current = order[i]
+            for class_id in range(n_classes):
+                next_states = frozenset(d for s in current for d in moves[s].get(class_id, ()))
+                if next_states not in ids:
+                    ids[next_states] = len(order)
+                    order.append(next_states)
+                transitions.append(ids[next_states])
+            i += 1
+
+        accepting = bytearray(any(fsm.is_acceptance(s) for s in states) for states in order)
+        return cls(alphabet, transitions, accepting, ids[start])
+
+    # Transitions that do not lead to the dead state
+    @property
+    def n_transitions(self) -> int:
+        return sum(1 for destination in self.transitions if destination != self.DEAD_STATE)
+
+    def merge_states(self, blocks: List[set], block_of: Sequence[int]) -> Tuple['DFATable', List[int]]:
+        '''
+            Quotient of the table by a partition of its states (the result of a minimizer),
+            block_of[s] is the index of the block of s. The dead state stays 0 and every block
+            becomes the state of one of its members, also returned as the representative of each new state.
+        '''
+        k = self.n_classes
+        ids = {block_of[self.DEAD_STATE]: self.DEAD_STATE}
+        for index in range(len(blocks)):
+            if index not in ids:
+                ids[index] = len(ids)
+
+        transitions = array('i', [0]) * (len(blocks) * k)
+        accepting = bytearray(len(blocks))
+        representatives = [0] * len(blocks)
+        for index, block in enumerate(blocks):
+            representative = next(iter(block))
+            representatives[ids[index]] = representative
+            row = ids[index] * k
+            for c in range(k):
+                transitions[row + c] = ids[block_of[self.transitions[representative * k + c]]]
+            accepting[ids[index]] = self.accepting[representative]
+
+        return DFATable(self.alphabet, transitions, accepting, ids[block_of[self.start]]), representatives
+
+    def to_fsm(self) -> FSM:
+        '''
+            View of the table as an FSM (e.g. for visualize or to_json).
+            The dead state is left out, each symbol class becomes one action per interval it covers.
+        '''
+        fsm = FSM()
+        states = [State("Start" if i == self.start else f'S{i}') for i in range(self.n_states)]
+        labels = [self.alphabet.actions(class_id) for class_id in range(self.n_classes)]
+
+        for i, state in enumerate(states):
+            if i != self.DEAD_STATE or i == self.start:
+                fsm.add_state(state)
+                if self.accepting[i]: fsm.set_acceptance(state)
+        fsm.initial_state = states[self.start]
+
+        for i, state in enumerate(states):
+            if i == self.DEAD_STATE: continue
+            for class_id in range(self.n_classes):
+                destination = self.transitions[i * self.n_classes + class_id]
+                if destination == self.DEAD_STATE: continue
+                for action in labels[class_id]:
+                    fsm.add_transition(state, states[destination], action)
+        return fsm
+
+    def to_bytes(self) -> bytes:
+        alphabet = self.alphabet
+        header = _HEADER.pack(MAGIC, FORMAT_VERSION, len(alphabet._starts), self.n_classes, self.n_states, self.start)
+        bitmap = bytearray((self.n_states + 7) // 8)
+        for state in range(self.n_states):
+            if self.accepting[state]:
+                bitmap[state >> 3] |= 1 << (state & 7)
+
+        sections = [header]
+        for values in (alphabet._starts, alphabet._ids, alphabet.table, self.transitions):
+            values = array('i', values)
+            if sys.byteorder != 'little': values.byteswap()
+            sections.append(values.tobytes())
+        sections.append(bytes(bitmap))
+        if self.reverse is not None:
+            sections.append(self.reverse.to_bytes())
+        return b''.join(sections)
+
+    @classmethod
+    def from_buffer(cls, buffer) -> 'DFATable':
+        '''
+            Load a table from anything supporting the buffer protocol (bytes, mmap, ...).
+            On little-endian machines the int sections are zero-copy views into the buffer,
+            only the accept bitmap is expanded to one byte per state.
+        '''
+        view = memoryview(buffer)
+        magic, version, n_intervals, n_classes, n_states, start = _HEADER.unpack_from(view)
+        if magic != MAGIC: raise ValueError("Not a compiled DFA file")
+        if version != FORMAT_VERSION: raise ValueError(f"Unsupported DFA format version {version}")
+
+        offset = _HEADER.size
+        def ints(count: int) -> Sequence[int]:
+            nonlocal offset
+            section = view[offset:offset + 4*count]
+            offset += 4*count
+            if sys.byteorder == 'little':
+                return section.cast('i')
+            values = array('i', section.tobytes())
+            values.byteswap()
+            return values
+
+        starts, ids, table = ints(n_intervals), ints(n_intervals), ints(LATIN1_SIZE)
+        transitions = ints(n_states * n_classes)
+        bitmap = view[offset:offset + (n_states + 7) // 8]
+        if len(bitmap) * 8 < n_states: raise ValueError("Truncated DFA file")
+        accepting = bytearray((bitmap[state >> 3] >> (state & 7)) & 1 for state in range(n_states))
+        offset += len(bitmap)
+
+        alphabet = Alphabet(starts, ids, size=n_classes, table=table)
+        dfa = cls(alphabet, transitions, accepting, start)
+        if len(view) > offset:
+            dfa.reverse = cls.from_buffer(view[offset:])
+        return dfa
+
+    def save(self, filename: str):
+        with open(filename, 'wb') as file:
+            file.write(self.to_bytes())
+
+    # The file is mapped read-only, the table keeps the mapping alive
+    @classmethod
+    def load(cls, filename: str) -> 'DFATable':
+        with open(filename, 'rb') as file:
+            mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        table = cls.from_buffer(mapping)
+        table._mapping = mapping
+        return table
+
+    def longest_match(self, string: str, pos: int, endpos: int) -> int:
+        '''Returns the end of the longest match anchored at pos, or -1 if there is none'''
+        transitions, accepting, n_classes = self.transitions, self.accepting, self.n_classes
+        table, lookup = self.alphabet.table, self.alphabet.lookup
+
+        state = self.start
+        last = pos if accepting[state] else -1
+        for i in range(pos, endpos):
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            state = transitions[state * n_classes + class_id]
+            if state == self.DEAD_STATE:
+                break
+            if accepting[state]:
+                last = i + 1
+        return last
+
+    def longest_match_backward(self, string: str, pos: int, end: int) -> int:
+        '''
+            Reads string backwards from end down to pos (a reverse table does this), returns the smallest
+            start of a match of the table ending at end, or -1 if there is none
+        '''
+        transitions, accepting, n_classes = self.transitions, self.accepting, self.n_classes
+        table, lookup = self.alphabet.table, self.alphabet.lookup
+
+        state = self.start
+        first = end if accepting[state] else -1
+        for i in range(end - 1, pos - 1, -1):
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            state = transitions[state * n_classes + class_id]
+            if state == self.DEAD_STATE:
+                break
+            if accepting[state]:
+                first = i
+        return first
+
+    def _search_step(self, cache: _SearchCache, state: int, class_id: int) -> Tuple[_SearchCache, int]:
+        '''
+            Next search state, made the first time the input reaches it:
+                1. every thread moves on the symbol class, the dead ones are dropped; of two threads in
+                   the same table state only the older one is kept, both match the same way from there
+                2. until a match is seen, a new thread starts at the next position, the youngest one
+                3. when a thread accepts, the threads younger than it are dropped and no new thread
+                   starts: the matches they could find start further to the right
+        '''
+        threads, matched = cache.keys[state]
+        transitions, n_classes = self.transitions, self.n_classes
+        following: List[int] = []
+        for thread in threads:
+            next_thread = transitions[thread * n_classes + class_id]
+            if next_thread != self.DEAD_STATE and next_thread not in following:
+                following.append(next_thread)
+        if not matched and self.start not in following:
+            following.append(self.start)
+        for index, thread in enumerate(following):
+            if self.accepting[thread]:
+                following, matched = following[:index + 1], True
+                break
+        key = (tuple(following), matched)
+
+        with self._search_lock:
+            current = self._search_cache
+            next_state = current.ids.get(key)
+            if next_state is None:
+                if len(current.keys) >= MAX_SEARCH_STATES:
+                    current = self._search_cache = _SearchCache(self)
+                    next_state = current.ids.get(key)
+                if next_state is None:
+                    next_state = current.add(key, self)
+            # the transition is only set once the state it leads to is complete, and not on a cache
+            # another thread flushed in the meantime: state is a state of that cache
+            if current is cache:
+                cache.transitions[state * n_classes + class_id] = next_state
+            return current, next_state
+
+    def _leftmost_longest_end(self, string: str, pos: int, endpos: int) -> int:
+        '''
+            End of the leftmost-longest match starting at pos or later, -1 if there is none, in one pass
+            that starts a thread of the table at every position (the states of RE2's DFA in longest
+            match mode). The last position where a thread accepts is the end of the match:
+            an older thread accepting later starts further left, the same thread accepting later is longer.
+        '''
+        cache = self._search_cache
+        if cache is None:
+            with self._search_lock:
+                if self._search_cache is None:
+                    self._search_cache = _SearchCache(self)
+                cache = self._search_cache
+        transitions, accepting, n_classes = cache.transitions, cache.accepting, cache.n_classes
+        table, lookup = self.alphabet.table, self.alphabet.lookup
+
+        state = cache.start
+        last = -1
+        for i in range(pos, endpos):
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            next_state = transitions[state * n_classes + class_id]
+            if next_state == _SearchCache.UNKNOWN:
+                cache, next_state = self._search_step(cache, state, class_id)
+                transitions, accepting = cache.transitions, cache.accepting
+            state = next_state
+            if state == self.DEAD_STATE:
+                break
+            if accepting[state]:
+                last = i + 1
+        return last
+
+    def _search(self, string: str, pos: int, endpos: int, finder: Optional[LiteralFinder]) -> Optional[Match]:
+        if self.accepting[self.start]:
+            return self._match(string, pos, self.longest_match(string, pos, endpos))
+        if self.reverse is not None:
+            # no match starts before the first candidate of the prefilter, from there the forward pass
+            # finds where the match ends and the reverse table where it starts
+            if finder is not None:
+                pos = finder.next(pos)
+                if pos < 0: return None
+            end = self._leftmost_longest_end(string, pos, endpos)
+            if end < 0:
+                return None
+            if finder is not None: finder.hit()
+            return self._match(string, self.reverse.longest_match_backward(string, pos, end), end)
+        if finder is not None:
+            return super()._search(string, pos, endpos, finder)
+
+        # skip positions whose symbol leads straight to the dead state
+        row = self.start * self.n_classes
+        live = bytearray(self.transitions[row + c] != self.DEAD_STATE for c in range(self.n_classes))
+        table, lookup = self.alphabet.table, self.alphabet.lookup
+        for i in range(pos, endpos):
+            code = ord(string[i])
+            if not live[table[code] if code < LATIN1_SIZE else lookup(string[i])]:
+                continue
+            end = self.longest_match(string, i, endpos)
+            if end >= 0:
+                return self._match(string, i, end)
+        return None
@@ -0,0 +1,75 @@
+from typing import Iterator, Optional, Tuple
+from match import Match
+from literals import Prefilter, LiteralFinder
+from captures import Captures
+
+def bounds(string: str, pos: int, endpos: Optional[int]) -> Tuple[int, int]:
+    '''pos and endpos clamped to the string as re does; there is no match when pos is then after endpos'''
+    endpos = len(string) if endpos is None else min(max(endpos, 0), len(string))
+    return min(max(pos, 0), len(string)), endpos
+
+
+class Engine:
+    '''
+        Base class of the matching engines. An engine only has to implement longest_match,
+        the leftmost-longest semantics of match, fullmatch, search and finditer are shared.
+        Engines with a faster search override _search.
+    '''
+    # Literal prefilter of the pattern, None when the pattern has no literal worth searching for
+    prefilter: Optional[Prefilter] = None
+    # Finds the groups of a match, None when the pattern has no capturing group
+    captures: Optional[Captures] = None
+
+    def longest_match(self, string: str, pos: int, endpos: int) -> int:
+        '''Returns the end of the longest match anchored at pos, or -1 if there is none'''
+        raise NotImplementedError
+
+    def match(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Match]:
+        pos, endpos = bounds(string, pos, endpos)
+        if pos > endpos: return None
+        end = self.longest_match(string, pos, endpos)
+        return self._match(string, pos, end) if end >= 0 else None
+
+    def fullmatch(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Match]:
+        pos, endpos = bounds(string, pos, endpos)
+        if pos > endpos: return None
+        end = self.longest_match(string, pos, endpos)
+        return self._match(string, pos, end) if end >= 0 and end == endpos else None
+
+    # Every match an engine reports is made here, so it can find its groups
+    def _match(self, string: str, start: int, end: int) -> Match:
+        return Match(string, start, end, self.captures)
+
+    def search(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Match]:
+        pos, endpos = bounds(string, pos, endpos)
+        if pos > endpos: return None
+        return self._search(string, pos, endpos, self._finder(string, endpos))
+
+    def _finder(self, string: str, endpos: int) -> Optional[LiteralFinder]:
+        return self.prefilter.finder(string, endpos) if self.prefilter is not None else None
+
+    def _search(self, string: str, pos: int, endpos: int, finder: Optional[LiteralFinder]) -> Optional[Match]:
+        '''Leftmost-longest search: the first position where a match starts, extended as far as possible'''
+        i = pos
+        while i <= endpos:
+            if finder is not None:
+                i = finder.next(i)
+                if i < 0: return None
+            end = self.longest_match(string, i, endpos)
+            if end >= 0:
+                if finder is not None: finder.hit()
+                return self._match(string, i, end)
+            i += 1
+        return None
+
+    def finditer(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Match]:
+        pos, endpos = bounds(string, pos, endpos)
+        # one finder for all the searches, so every literal occurrence is only found once
+        finder = self._finder(string, endpos)
+        while pos <= endpos:
+            match = self._search(string, pos, endpos, finder)
+            if match is None:
+                return
+            yield match
+            # an empty match must not be reported twice at the same position
+            pos = match.end() if match.end() > match.start() else match.end() + 1
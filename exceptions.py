@@ -1,4 +1,31 @@
 class ParserSyntaxError(Exception):
-    def __init__(self, message):
+    # position: index in the pattern where the error was found, None when it is not known
+    def __init__(self, message, position: int = None):
         self.message = message
-        super().__init__(message)
\ No newline at end of file
+        self.position = position
+        super().__init__(message if position is None else f"{message} at position {position}")
+
+    # Rebuilt from the constructor arguments, so errors cross process boundaries (compile_many)
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.position))
+
+class CompileLimitError(Exception):
+    # limit: the CompileLimits field that was exceeded ('nfa_states', 'dfa_states', 'memory_bytes' or 'seconds'),
+    # value: how far the compile got, metrics: the stages that ran until then (set by RegexParser.compile)
+    def __init__(self, message, limit: str, value, metrics=None):
+        self.message = message
+        self.limit = limit
+        self.value = value
+        self.metrics = metrics
+        super().__init__(message)
+
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.limit, self.value, self.metrics))
+
+class StateLimitError(CompileLimitError):
+    def __init__(self, message, states: int):
+        self.states = states
+        super().__init__(message, 'dfa_states', states)
+
+    def __reduce__(self):
+        return (self.__class__, (self.message, self.states), {'metrics': self.metrics})
@@ -1,18 +1,26 @@
 from dataclasses import dataclass
 from typing import Dict, Set,List
 import json
-from graphviz import Digraph
 
 Action = str
     
 class State:
-    name: str
-    # frozenset is an immutable version of set (once created can never be modified)
-    elements: frozenset
+    # name and elements define the hash, so they are read-only: a state renamed after it was
+    # added to a dict could never be found again
+    __slots__ = ('_name', '_elements')
     
     def __init__(self, name: str, elements=None):
-        self.name = name
-        self.elements = elements if elements is not None else frozenset()
+        self._name = name
+        # frozenset is an immutable version of set (once created can never be modified)
+        self._elements = elements if elements is not None else frozenset()
+    
+    @property
+    def name(self) -> str:
+        return self._name
+    
+    @property
+    def elements(self) -> frozenset:
+        return self._elements
         
     # In order to use State object as python dict, we need to implement both __hash__ and __eq__
     # If the state has elements, we use it to define both __hash__ and __eq__, otherwise we use the state name
@@ -108,6 +116,8 @@ class FSM():
             json.dump(data, file, indent=2, ensure_ascii=False)
             
     def visualize(self, filename: str, label: str=None):
+        # graphviz is only needed for diagnostics, so it is imported on first use
+        from graphviz import Digraph
         label = label if label is not None else filename
         graph = Digraph(comment=label)
         graph.attr(rankdir='LR')
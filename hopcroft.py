@@ -0,0 +1,119 @@
+import time
+from array import array
+from typing import Hashable, List, Optional, Sequence, Tuple
+from dfa_table import DFATable
+from exceptions import CompileLimitError
+
+# splitters between two checks of the deadline
+DEADLINE_INTERVAL = 1024
+
+class HopcroftMinimizer:
+    '''
+        Minimizer over integer DFAs using Hopcroft's partition refinement, O(n k log n)
+        for n states and k symbol classes. It can be used in place of Minimizer.
+    '''
+    # splitters taken from the worklist by the last minimization
+    splitters: int = 0
+    # Raise CompileLimitError when time.perf_counter() passes it, None for no limit
+    deadline: Optional[float]
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+
+    def execute(self, DFA: DFATable) -> DFATable:
+        return self.minimize(DFA)
+
+    def minimize(self, table: DFATable) -> DFATable:
+        minimized_table, _ = self.minimize_labeled(table, table.accepting)
+        return minimized_table
+
+    def minimize_labeled(self, table: DFATable, labels: Sequence[Hashable]) -> Tuple[DFATable, List[Hashable]]:
+        '''
+            Minimize a DFA whose states carry labels (e.g. which patterns they accept),
+            only states with equal labels can be merged. Returns the table and the label of each new state.
+
+            algorithm for minimizing a DFA (Hopcroft):
+                1. start with one block per label, e.g. [acceptance] and [not acceptance] states
+
+                2. put (B, c) on the worklist for every initial block B but the largest one
+                   and every symbol class c
+
+                3. while the worklist is not empty:
+                    a. pop a splitter (B, c) and find X, the states entering B on c
+
+                    b. every block Y that X cuts in two is split into Y ∩ X and Y \ X,
+                       the smaller half becomes a new block
+
+                    c. put (new block, c) on the worklist for every symbol class c
+
+                4. every block becomes one state of the minimized DFA
+        '''
+        n, k = table.n_states, table.n_classes
+        predecessors, offsets = self._inverse_transitions(table)
+
+        initial_blocks = {}
+        for state in range(n):
+            initial_blocks.setdefault(labels[state], set()).add(state)
+        blocks: List[set] = list(initial_blocks.values())
+        block_of = array('i', [0]) * n
+        for index, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = index
+
+        # every initial block but the largest one is a splitter
+        largest = max(range(len(blocks)), key=lambda b: len(blocks[b]))
+        worklist = [(b, c) for b in range(len(blocks)) if b != largest for c in range(k)]
+
+        self.splitters = 0
+        while worklist:
+            splitter, class_id = worklist.pop()
+            self.splitters += 1
+            if self.deadline is not None and self.splitters % DEADLINE_INTERVAL == 0 \
+                    and time.perf_counter() > self.deadline:
+                raise CompileLimitError(f"Minimization ran out of time after {self.splitters} splitters",
+                                        'seconds', self.splitters)
+            base = class_id * (n + 1)
+            # states entering the splitter on class_id, grouped by their block
+            touched = {}
+            for target in blocks[splitter]:
+                for i in range(offsets[base + target], offsets[base + target + 1]):
+                    source = predecessors[i]
+                    touched.setdefault(block_of[source], []).append(source)
+
+            for index, members in touched.items():
+                block = blocks[index]
+                if len(members) == len(block):
+                    continue
+                moved = set(members)
+                if 2 * len(moved) > len(block):
+                    moved = block - moved
+                block -= moved
+                new_index = len(blocks)
+                blocks.append(moved)
+                for state in moved:
+                    block_of[state] = new_index
+                # the new block is the smaller half, so it is always enough to split with it
+                worklist.extend((new_index, c) for c in range(k))
+
+        minimized_table, representatives = table.merge_states(blocks, block_of)
+        return minimized_table, [labels[state] for state in representatives]
+
+    # For every class c and state t, the states entering t on c are
+    # predecessors[offsets[c*(n+1) + t] : offsets[c*(n+1) + t + 1]]
+    def _inverse_transitions(self, table: DFATable):
+        n, k = table.n_states, table.n_classes
+        offsets = array('i', [0]) * (k * (n + 1))
+        for source in range(n):
+            for c in range(k):
+                offsets[c * (n + 1) + table.transitions[source * k + c] + 1] += 1
+        for i in range(1, len(offsets)):
+            offsets[i] += offsets[i-1]
+
+        predecessors = array('i', [0]) * (n * k)
+        filled = array('i', offsets)
+        for source in range(n):
+            for c in range(k):
+                slot = c * (n + 1) + table.transitions[source * k + c]
+                predecessors[filled[slot]] = source
+                filled[slot] += 1
+        return predecessors, offsets
@@ -0,0 +1,246 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+from compact_nfa import CompactNFA
+from alphabet import LATIN1_SIZE
+from engine import Engine
+from match import Match
+from literals import LiteralFinder
+
+class _StateCache:
+    '''
+        The DFA states materialized so far. A flush replaces the whole cache object,
+        so a scan that still holds the old one keeps working on consistent tables.
+    '''
+    UNKNOWN = -1
+
+    def __init__(self, nfa: CompactNFA):
+        self.n_classes = nfa.alphabet.size
+        self.ids = {}
+        self.sets: List[int] = []
+        # transitions[s * n_classes + c], UNKNOWN until the input reaches it
+        self.transitions: List[int] = []
+        self.accepting = bytearray()
+        self.add(0, nfa)
+        self.start = self.add(nfa.start, nfa)
+
+    def add(self, states: int, nfa: CompactNFA) -> int:
+        state = len(self.sets)
+        self.ids[states] = state
+        self.sets.append(states)
+        self.transitions.extend([self.UNKNOWN] * self.n_classes)
+        self.accepting.append(nfa.is_acceptance(states))
+        if states == 0:
+            # the dead state loops on itself
+            self.transitions[state * self.n_classes:] = [state] * self.n_classes
+        return state
+
+
+class _SearchCache:
+    '''
+        The states of the unanchored leftmost-longest search materialized so far, flushed like _StateCache.
+        A search state is a key (groups, matched): the NFA states of the matches in progress grouped by
+        where they started, from the first start on, and whether a match was seen.
+    '''
+    UNKNOWN = -1
+
+    def __init__(self, nfa: CompactNFA):
+        self.n_classes = nfa.alphabet.size
+        self.ids: Dict[Tuple[Tuple[int, ...], bool], int] = {}
+        self.keys: List[Tuple[Tuple[int, ...], bool]] = []
+        self.transitions: List[int] = []
+        self.accepting = bytearray()
+        self.add(((), True), nfa)
+        self.start = self.add(((nfa.start,), False), nfa)
+
+    def add(self, key: Tuple[Tuple[int, ...], bool], nfa: CompactNFA) -> int:
+        state = len(self.keys)
+        self.ids[key] = state
+        self.keys.append(key)
+        self.transitions.extend([self.UNKNOWN] * self.n_classes)
+        self.accepting.append(any(nfa.is_acceptance(group) for group in key[0]))
+        if not key[0]:
+            # no thread left: the dead state loops on itself
+            self.transitions[state * self.n_classes:] = [state] * self.n_classes
+        return state
+
+
+class LazyDFA(Engine):
+    '''
+        DFA built on the fly from the NFA (as in RE2): a DFA state is only created when the input
+        reaches it. At most max_states states are cached, when the cache is full it is flushed and
+        rebuilt from the current state, so memory is bounded by
+        max_states * (n_classes transitions + one NFA bitset).
+        Search scans once with the unanchored states of _SearchCache to find where the match ends,
+        then runs the lazy DFA of the reversed NFA backwards from there to find where it starts.
+    '''
+    DEAD_STATE = 0
+    DEFAULT_MAX_STATES = 10000
+
+    nfa: CompactNFA
+    max_states: int
+    flushes: int
+    # Lazy DFA of the reversed NFA, None when search tries every start position instead
+    reverse: Optional['LazyDFA']
+    _cache: _StateCache
+    _search_cache: _SearchCache
+    # Taken to add states or flush a cache, scans read the caches without it
+    _lock: threading.Lock
+
+    def __init__(self, nfa: CompactNFA, max_states: int = DEFAULT_MAX_STATES, reverse: Optional['LazyDFA'] = None):
+        # the dead and start states must always fit
+        if max_states < 3: raise ValueError("max_states must be at least 3")
+        self.nfa = nfa
+        self.max_states = max_states
+        self.reverse = reverse
+        self.flushes = 0
+        self._cache = _StateCache(nfa)
+        self._search_cache = _SearchCache(nfa)
+        self._lock = threading.Lock()
+
+    @property
+    def cached_states(self) -> int:
+        return len(self._cache.sets)
+
+    def _next_state(self, cache: _StateCache, state: int, class_id: int) -> Tuple[_StateCache, int]:
+        next_states = self.nfa.step_class(cache.sets[state], class_id)
+        with self._lock:
+            current = self._cache
+            next_state = current.ids.get(next_states)
+            if next_state is None:
+                if len(current.sets) >= self.max_states:
+                    current = self._cache = _StateCache(self.nfa)
+                    self.flushes += 1
+                    next_state = current.ids.get(next_states)
+                if next_state is None:
+                    next_state = current.add(next_states, self.nfa)
+            # the transition is only set once the state it leads to is complete, and not on a cache
+            # another thread flushed in the meantime: state is a state of that cache
+            if current is cache:
+                cache.transitions[state * cache.n_classes + class_id] = next_state
+            return current, next_state
+
+    def longest_match(self, string: str, pos: int, endpos: int) -> int:
+        cache = self._cache
+        transitions, accepting, n_classes = cache.transitions, cache.accepting, cache.n_classes
+        table, lookup = self.nfa.alphabet.table, self.nfa.alphabet.lookup
+
+        state = cache.start
+        last = pos if accepting[state] else -1
+        for i in range(pos, endpos):
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            next_state = transitions[state * n_classes + class_id]
+            if next_state == _StateCache.UNKNOWN:
+                cache, next_state = self._next_state(cache, state, class_id)
+                transitions, accepting = cache.transitions, cache.accepting
+            state = next_state
+            if state == self.DEAD_STATE:
+                break
+            if accepting[state]:
+                last = i + 1
+        return last
+
+    def longest_match_backward(self, string: str, pos: int, end: int) -> int:
+        '''
+            Reads string backwards from end down to pos (a reverse LazyDFA does this), returns the smallest
+            start of a match of the NFA ending at end, or -1 if there is none
+        '''
+        cache = self._cache
+        transitions, accepting, n_classes = cache.transitions, cache.accepting, cache.n_classes
+        table, lookup = self.nfa.alphabet.table, self.nfa.alphabet.lookup
+
+        state = cache.start
+        first = end if accepting[state] else -1
+        for i in range(end - 1, pos - 1, -1):
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            next_state = transitions[state * n_classes + class_id]
+            if next_state == _StateCache.UNKNOWN:
+                cache, next_state = self._next_state(cache, state, class_id)
+                transitions, accepting = cache.transitions, cache.accepting
+            state = next_state
+            if state == self.DEAD_STATE:
+                break
+            if accepting[state]:
+                first = i
+        return first
+
+    def _search_step(self, cache: _SearchCache, state: int, class_id: int) -> Tuple[_SearchCache, int]:
+        '''
+            Next search state, made the first time the input reaches it:
+                1. every group moves on the symbol class; an NFA state already reached by an older group
+                   is dropped from the younger one, the older match wins with the same future
+                2. until a match is seen, the start states of a new match are added as the youngest group
+                3. when a group accepts, the groups younger than it are dropped and no new group
+                   starts: the matches they could find start further to the right
+        '''
+        nfa = self.nfa
+        groups, matched = cache.keys[state]
+        following: List[int] = []
+        seen = 0
+        for group in groups:
+            next_group = nfa.step_class(group, class_id) & ~seen
+            if next_group:
+                following.append(next_group)
+                seen |= next_group
+        if not matched and nfa.start & ~seen:
+            following.append(nfa.start & ~seen)
+        for index, group in enumerate(following):
+            if nfa.is_acceptance(group):
+                following, matched = following[:index + 1], True
+                break
+        key = (tuple(following), matched)
+
+        with self._lock:
+            current = self._search_cache
+            next_state = current.ids.get(key)
+            if next_state is None:
+                if len(current.keys) >= self.max_states:
+                    current = self._search_cache = _SearchCache(nfa)
+                    self.flushes += 1
+                    next_state = current.ids.get(key)
+                if next_state is None:
+                    next_state = current.add(key, nfa)
+            if current is cache:
+                cache.transitions[state * cache.n_classes + class_id] = next_state
+            return current, next_state
+
+    def _leftmost_longest_end(self, string: str, pos: int, endpos: int) -> int:
+        '''
+            End of the leftmost-longest match starting at pos or later, -1 if there is none, in one pass.
+            The last position where a group accepts is the end of the match: an older group accepting
+            later starts further left, the same group accepting later is longer.
+        '''
+        cache = self._search_cache
+        transitions, accepting, n_classes = cache.transitions, cache.accepting, cache.n_classes
+        table, lookup = self.nfa.alphabet.table, self.nfa.alphabet.lookup
+
+        state = cache.start
+        last = -1
+        for i in range(pos, endpos):
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            next_state = transitions[state * n_classes + class_id]
+            if next_state == _SearchCache.UNKNOWN:
+                cache, next_state = self._search_step(cache, state, class_id)
+                transitions, accepting = cache.transitions, cache.accepting
+            state = next_state
+            if state == self.DEAD_STATE:
+                break
+            if accepting[state]:
+                last = i + 1
+        return last
+
+    def _search(self, string: str, pos: int, endpos: int, finder: Optional[LiteralFinder]) -> Optional[Match]:
+        # a pattern matching the empty string matches at pos
+        if self.reverse is None or self.nfa.is_acceptance(self.nfa.start):
+            return super()._search(string, pos, endpos, finder)
+        # no match starts before the first candidate of the prefilter
+        if finder is not None:
+            pos = finder.next(pos)
+            if pos < 0: return None
+        end = self._leftmost_longest_end(string, pos, endpos)
+        if end < 0:
+            return None
+        if finder is not None: finder.hit()
+        return self._match(string, self.reverse.longest_match_backward(string, pos, end), end)
@@ -0,0 +1,139 @@
+from typing import List, NamedTuple, Tuple
+from exceptions import ParserSyntaxError
+
+# Token kinds
+CHAR = 'CHAR'
+SET = 'SET'
+STAR = '*'
+PLUS = '+'
+QUESTION = '?'
+PIPE = '|'
+LPAREN = '('
+RPAREN = ')'
+# counted repetition {m}, {m,} or {m,n}
+REPEAT = 'REPEAT'
+
+# largest count of a counted repetition, every count is a copy of the repeated NFA (RE2 has the same limit)
+MAX_REPEAT = 1000
+
+# '.' stands for any letter or digit
+DOT_RANGES = (('a', 'z'), ('A', 'Z'), ('0', '9'))
+
+_OPERATORS = {'*': STAR, '+': PLUS, '?': QUESTION, '|': PIPE, '(': LPAREN, ')': RPAREN}
+
+
+class Token(NamedTuple):
+    kind: str
+    # the character of a CHAR token, the ranges of a SET token, (min, max) of a REPEAT token,
+    # whether an LPAREN token opens a capturing group, None otherwise
+    value: object
+    start: int
+    end: int
+
+
+def _check_range(low: str, high: str, position: int):
+    # both ends are lowercase letters, uppercase letters or digits, in increasing order
+    same_kind = (low.islower() and high.islower()) or (low.isupper() and high.isupper()) \
+        or (low.isdigit() and high.isdigit())
+    if not same_kind or low >= high:
+        raise ParserSyntaxError("Invalid range", position)
+
+
+def _is_range(pattern: str, i: int) -> bool:
+    return i + 2 < len(pattern) and pattern[i+1] == '-' and pattern[i+2] != ']'
+
+
+def _char_set(pattern: str, i: int) -> Tuple[Token, int]:
+    '''The bracket expression starting at pattern[i] == '[', and the index after it'''
+    start, n = i, len(pattern)
+    ranges = []
+    i += 1
+    while i < n and pattern[i] != ']':
+        char = pattern[i]
+        if not char.isalnum():
+            raise ParserSyntaxError("Invalid range", i)
+        if _is_range(pattern, i):
+            _check_range(char, pattern[i+2], i)
+            ranges.append((char, pattern[i+2]))
+            i += 3
+        elif i + 1 < n and pattern[i+1] == '-':
+            raise ParserSyntaxError("Invalid range", i)
+        else:
+            ranges.append((char, char))
+            i += 1
+    if i >= n:
+        raise ParserSyntaxError("Unmatched square bracket", start)
+    if not ranges:
+        raise ParserSyntaxError("Empty character set", start)
+    return Token(SET, tuple(ranges), start, i + 1), i + 1
+
+
+def _count(text: str, position: int) -> int:
+    if not text.isdigit() or not text.isascii():
+        raise ParserSyntaxError("Invalid repetition", position)
+    count = int(text)
+    if count > MAX_REPEAT:
+        raise ParserSyntaxError(f"Repetition count larger than {MAX_REPEAT}", position)
+    return count
+
+
+def _repeat(pattern: str, i: int) -> Tuple[Token, int]:
+    '''The counted repetition starting at pattern[i] == '{', and the index after it'''
+    close = pattern.find('}', i)
+    if close < 0:
+        raise ParserSyntaxError("Unmatched curly brace", i)
+    low, comma, high = pattern[i+1:close].partition(',')
+    low = _count(low, i)
+    high = low if not comma else None if high == '' else _count(high, i)
+    if high is not None and low > high:
+        raise ParserSyntaxError("Invalid repetition", i)
+    return Token(REPEAT, (low, high), i, close + 1), close + 1
+
+
+def tokenize(pattern: str) -> List[Token]:
+    '''
+        Splits a pattern into tokens in one pass. Bracket expressions, '.' and ranges
+        such as 'a-z' become a single SET token, so later stages never see '-' or '[',
+        and a counted repetition such as {2,5} becomes a single REPEAT token
+    '''
+    tokens = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char.isalnum():
+            if i + 1 < n and pattern[i+1] == '-':
+                if i + 2 >= n or not pattern[i+2].isalnum():
+                    raise ParserSyntaxError("Invalid range", i)
+                _check_range(char, pattern[i+2], i)
+                tokens.append(Token(SET, ((char, pattern[i+2]),), i, i + 3))
+                i += 3
+                continue
+            tokens.append(Token(CHAR, char, i, i + 1))
+        elif char == '[':
+            token, i = _char_set(pattern, i)
+            tokens.append(token)
+            continue
+        elif char == '{':
+            token, i = _repeat(pattern, i)
+            tokens.append(token)
+            continue
+        elif char == '}':
+            raise ParserSyntaxError("Unmatched curly brace", i)
+        elif char == '.':
+            tokens.append(Token(SET, DOT_RANGES, i, i + 1))
+        elif char == '(':
+            # (?:...) groups without capturing
+            capturing = not pattern.startswith('?:', i + 1)
+            tokens.append(Token(LPAREN, capturing, i, i + 1 if capturing else i + 3))
+            i += 1 if capturing else 3
+            continue
+        elif char in _OPERATORS:
+            tokens.append(Token(_OPERATORS[char], None, i, i + 1))
+        elif char == ']':
+            raise ParserSyntaxError("Unmatched square bracket", i)
+        elif char == '-':
+            raise ParserSyntaxError("Invalid range", i)
+        else:
+            raise ParserSyntaxError(f"Invalid symbol {char}", i)
+        i += 1
+    return tokens
@@ -0,0 +1,233 @@
+import threading
+from functools import reduce
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple
+from regex_ast import Node, Literal, CharSet, Concat, Alternate, Group, CharRange, fold
+
+# longest literal kept, longer ones are cut (a prefix of a prefix is still a prefix)
+MAX_LITERAL_LENGTH = 16
+# most alternative literals kept in a set, more are not worth one find each
+MAX_LITERALS = 8
+# ranges up to this many characters become alternative literals
+MAX_RANGE_LITERALS = 4
+
+Literals = Optional[FrozenSet[str]]
+
+
+class LiteralInfo(NamedTuple):
+    '''
+        What is known about the strings a subexpression matches. A set is None when it is unknown
+        or too large, prefixes and suffixes never contain the empty string.
+    '''
+    # every string the subexpression matches
+    exact: Literals
+    # every match starts with one of these
+    prefixes: Literals
+    # every match ends with one of these
+    suffixes: Literals
+    # every match contains this literal, '' when there is none
+    required: str
+
+
+def _cross(A: Literals, B: Literals) -> Literals:
+    if A is None or B is None or len(A) * len(B) > MAX_LITERALS: return None
+    return frozenset(a + b for a in A for b in B)
+
+
+def _union(A: Literals, B: Literals) -> Literals:
+    if A is None or B is None: return None
+    return A | B
+
+
+def _trim(literals: Literals, keep_end: bool) -> Literals:
+    if literals is None or '' in literals or len(literals) > MAX_LITERALS: return None
+    if keep_end:
+        return frozenset(literal[-MAX_LITERAL_LENGTH:] for literal in literals)
+    return frozenset(literal[:MAX_LITERAL_LENGTH] for literal in literals)
+
+
+def _make(exact: Literals, prefixes: Literals, suffixes: Literals, required: str) -> LiteralInfo:
+    if exact is not None and (len(exact) > MAX_LITERALS or any(len(s) > MAX_LITERAL_LENGTH for s in exact)):
+        exact = None
+    prefixes, suffixes = _trim(prefixes, keep_end=False), _trim(suffixes, keep_end=True)
+    # a set of one literal is required as well
+    for literals in (exact, prefixes, suffixes):
+        if literals is not None and len(literals) == 1:
+            literal = next(iter(literals))
+            if len(literal) > len(required): required = literal
+    return LiteralInfo(exact, prefixes, suffixes, required)
+
+
+def _char(char: str) -> LiteralInfo:
+    literals = frozenset(char)
+    return _make(literals, literals, literals, char)
+
+
+def _char_set(ranges: Tuple[CharRange, ...]) -> LiteralInfo:
+    if sum(ord(high) - ord(low) + 1 for low, high in ranges) > MAX_RANGE_LITERALS:
+        return LiteralInfo(None, None, None, '')
+    literals = frozenset(chr(code) for low, high in ranges for code in range(ord(low), ord(high) + 1))
+    return _make(literals, literals, literals, '')
+
+
+def _concat(A: LiteralInfo, B: LiteralInfo) -> LiteralInfo:
+    if A.exact is None:
+        prefixes = A.prefixes
+    else:
+        prefixes = _cross(A.exact, B.prefixes) or A.exact
+    if B.exact is None:
+        suffixes = B.suffixes
+    else:
+        suffixes = _cross(A.suffixes, B.exact) or B.exact
+    required = max(A.required, B.required, key=len)
+    return _make(_cross(A.exact, B.exact), prefixes, suffixes, required)
+
+
+def _alternate(A: LiteralInfo, B: LiteralInfo) -> LiteralInfo:
+    required = A.required if A.required == B.required else ''
+    return _make(_union(A.exact, B.exact), _union(A.prefixes, B.prefixes), _union(A.suffixes, B.suffixes), required)
+
+
+def _repeat(A: LiteralInfo, low: int, high: Optional[int]) -> LiteralInfo:
+    exact = None
+    if high is not None and A.exact is not None:
+        # the strings of low, low+1, ..., high copies
+        exact, copies = frozenset(), frozenset({''})
+        for count in range(high + 1):
+            if count >= low:
+                exact = exact | copies
+            if count == high: break
+            copies = _cross(copies, A.exact)
+            if copies is None or len(exact) > MAX_LITERALS:
+                exact = None
+                break
+    if low == 0:
+        return _make(exact, None, None, '')
+    return _make(exact, A.prefixes, A.suffixes, A.required)
+
+
+def _analyze(node: Node, infos: List[LiteralInfo]) -> LiteralInfo:
+    if isinstance(node, Literal):
+        return _char(node.char)
+    if isinstance(node, CharSet):
+        return _char_set(node.ranges)
+    if isinstance(node, Concat):
+        return reduce(_concat, infos)
+    if isinstance(node, Alternate):
+        return reduce(_alternate, infos)
+    if isinstance(node, Group):
+        return infos[0]
+    return _repeat(infos[0], node.min, node.max)
+
+
+def analyze(ast: Node) -> LiteralInfo:
+    '''
+        Literal analysis of the syntax tree, bottom-up like Thompson's construction:
+            1. a character is an exact literal, a small character set a set of exact literals
+            2. concatenation crosses exact sets; the prefixes of A.B are the prefixes of B behind every
+               exact string of A, or the prefixes of A when A is not finite (suffixes symmetrically)
+            3. alternation unions the sets; a repetition that may be empty loses everything
+               but its exact strings
+            4. a set of a single literal is also a required literal, the longest one is kept
+    '''
+    return fold(ast, _analyze)
+
+
+class LiteralFinder:
+    '''
+        Candidate match starts in one string. The next occurrence of every literal is remembered,
+        so over a whole finditer each literal is searched for only once per occurrence.
+    '''
+    def __init__(self, prefilter: 'Prefilter', string: str, endpos: int):
+        self._prefilter = prefilter
+        self._string = string
+        self._endpos = endpos
+        # endpos + 1 stands for no more occurrences
+        self._none = endpos + 1
+        self._next = [-1] * len(prefilter.prefixes)
+        self._required_at = -1
+
+    def next(self, pos: int) -> int:
+        '''First position at or after pos where a match may start, -1 if there is none'''
+        prefilter, string, endpos = self._prefilter, self._string, self._endpos
+        if prefilter.required and self._required_at < pos:
+            # a match starting at or after pos contains the required literal after pos
+            at = string.find(prefilter.required, pos, endpos)
+            self._required_at = at if at >= 0 else self._none
+        if self._required_at == self._none:
+            return -1
+        if not prefilter.prefixes:
+            candidate = pos
+        else:
+            candidate = self._none
+            for k, literal in enumerate(prefilter.prefixes):
+                at = self._next[k]
+                if at < pos:
+                    at = string.find(literal, pos, endpos)
+                    at = self._next[k] = at if at >= 0 else self._none
+                candidate = min(candidate, at)
+            if candidate == self._none:
+                return -1
+        prefilter.count(candidates=1)
+        return candidate
+
+    # The automaton matched at the last candidate
+    def hit(self):
+        self._prefilter.count(hits=1)
+
+
+class Prefilter:
+    '''
+        Skips to the positions where a match can start with str.find, before the automaton runs.
+        candidates counts the positions handed to the automaton and hits those where it matched:
+        a low hit rate means the literals are common in the input and the prefilter does not pay off.
+        The prefilter of a cached engine is shared by threads, the counters are updated under a lock.
+    '''
+    # every match starts with one of these, empty when no prefix is known
+    prefixes: List[str]
+    # every match contains this literal, '' when there is none
+    required: str
+    candidates: int
+    hits: int
+    _lock: threading.Lock
+
+    def __init__(self, prefixes: List[str], required: str):
+        self.prefixes = prefixes
+        self.required = required
+        self.candidates = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def count(self, candidates: int = 0, hits: int = 0):
+        with self._lock:
+            self.candidates += candidates
+            self.hits += hits
+
+    # Prefilters come back from the compile_many workers pickled, without their lock
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    # None when the pattern has no literal worth searching for
+    @classmethod
+    def from_info(cls, info: LiteralInfo) -> Optional['Prefilter']:
+        prefixes = sorted(info.prefixes) if info.prefixes is not None else []
+        # the required literal already is the only prefix
+        required = info.required if prefixes != [info.required] else ''
+        if not prefixes and not required:
+            return None
+        return cls(prefixes, required)
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.candidates if self.candidates else 0.0
+
+    def finder(self, string: str, endpos: int) -> LiteralFinder:
+        return LiteralFinder(self, string, endpos)
+
+    def __repr__(self):
+        return f"Prefilter(prefixes={self.prefixes}, required={self.required!r}, hit_rate={self.hit_rate:.2f})"
@@ -0,0 +1,60 @@
+from typing import List, Optional, Tuple
+from captures import Captures
+
+class Match:
+    '''
+        The span of a successful match, modeled after re.Match. The captures of the groups
+        are only computed the first time a group other than 0 is asked for.
+    '''
+    string: str
+    _start: int
+    _end: int
+    # Captures of the pattern, None when it has no capturing group
+    _captures: Optional[Captures]
+    _slots: Optional[List[int]] = None
+
+    def __init__(self, string: str, start: int, end: int, captures: Optional[Captures] = None):
+        self.string = string
+        self._start = start
+        self._end = end
+        self._captures = captures
+
+    def _span(self, group: int) -> Tuple[int, int]:
+        if group == 0:
+            return self._start, self._end
+        if self._captures is None or not 0 < group <= self._captures.n_groups:
+            raise IndexError("no such group")
+        if self._slots is None:
+            self._slots = self._captures.slots(self.string, self._start, self._end)
+        return self._slots[2 * group], self._slots[2 * group + 1]
+
+    # (-1, -1) for a group that did not take part in the match
+    def span(self, group: int = 0) -> Tuple[int, int]:
+        return self._span(group)
+
+    def start(self, group: int = 0) -> int:
+        return self._span(group)[0]
+
+    def end(self, group: int = 0) -> int:
+        return self._span(group)[1]
+
+    def _group(self, group: int, default=None) -> Optional[str]:
+        start, end = self._span(group)
+        return self.string[start:end] if start >= 0 else default
+
+    # group() is the whole match, group(n) a group, None if it did not take part; several give a tuple
+    def group(self, *groups: int):
+        if len(groups) <= 1:
+            return self._group(groups[0] if groups else 0)
+        return tuple(self._group(group) for group in groups)
+
+    def __getitem__(self, group: int) -> Optional[str]:
+        return self._group(group)
+
+    def groups(self, default=None) -> Tuple[Optional[str], ...]:
+        n_groups = self._captures.n_groups if self._captures is not None else 0
+        return tuple(self._group(group, default) for group in range(1, n_groups + 1))
+
+    def __repr__(self):
+        return f'<Match span={self.span()} match={self.group()!r}>'
+
@@ -0,0 +1,56 @@
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+
+class StageMetrics(NamedTuple):
+    # 'parse', 'simplify', 'thompson', 'alphabet', 'compact_nfa', 'subset_construction' or 'minimize'
+    name: str
+    seconds: float
+    # size of what the stage produced, 0 for the syntax tree stages
+    states: int
+    transitions: int
+    # stage specific counts, e.g. {'nodes': 12} or {'rounds': 4}
+    counters: Dict[str, int]
+
+
+class CompileMetrics:
+    '''
+        Timing and sizes of every stage of one compile, in the order the stages ran:
+            Regex('(a|b)*abb').metrics.stage('minimize').states  ->  5
+        as_dict() is plain JSON for export to a metrics pipeline.
+    '''
+    pattern: str
+    engine: str
+    stages: List[StageMetrics]
+
+    def __init__(self, pattern: str, engine: str):
+        self.pattern = pattern
+        self.engine = engine
+        self.stages = []
+
+    # Record a stage that started at time.perf_counter() == started and just finished
+    def add(self, name: str, started: float, states: int = 0, transitions: int = 0, **counters: int):
+        self.stages.append(StageMetrics(name, time.perf_counter() - started, states, transitions, counters))
+
+    # The last run of a stage, None if it did not run
+    def stage(self, name: str) -> Optional[StageMetrics]:
+        for stage in reversed(self.stages):
+            if stage.name == name:
+                return stage
+        return None
+
+    @property
+    def seconds(self) -> float:
+        return sum(stage.seconds for stage in self.stages)
+
+    def as_dict(self) -> dict:
+        return {
+            'pattern': self.pattern,
+            'engine': self.engine,
+            'seconds': self.seconds,
+            'stages': [stage._asdict() for stage in self.stages],
+        }
+
+    def __repr__(self):
+        stages = ', '.join(f'{stage.name}={stage.seconds * 1000:.2f}ms' for stage in self.stages)
+        return f"CompileMetrics(engine={self.engine!r}, {stages})"
@@ -0,0 +1,98 @@
+from typing import Dict, List, Optional, Tuple
+from compact_nfa import CompactNFA
+from alphabet import Alphabet, LATIN1_SIZE
+
+# NFA states above which the one-pass analysis is not tried, every state is one closure walk
+MAX_ONE_PASS_STATES = 4096
+
+# capture slots set before a move, and the one-pass state the move leads to
+Action = Tuple[Tuple[int, ...], int]
+
+
+class OnePass:
+    '''
+        One-pass DFA of a pattern with capturing groups: at every position at most one thread of the
+        tagged NFA can go on, so the captures are found in a single scan without any thread list.
+        Only built for patterns where that holds, e.g. (a+)(b+) or ([a-z]+)([0-9]+), not (a*)(a*).
+    '''
+    n_slots: int
+    alphabet: Alphabet
+    # actions[s][class_id]: what state s does on that symbol class
+    actions: List[Dict[int, Action]]
+    # accepts[s]: slots set when the match ends in state s, None if it cannot end there
+    accepts: List[Optional[Tuple[int, ...]]]
+
+    def __init__(self, n_slots: int, alphabet: Alphabet, actions: List[Dict[int, Action]],
+                 accepts: List[Optional[Tuple[int, ...]]]):
+        self.n_slots = n_slots
+        self.alphabet = alphabet
+        self.actions = actions
+        self.accepts = accepts
+
+    @classmethod
+    def build(cls, nfa: CompactNFA, tags: Dict[int, int], n_slots: int) -> Optional['OnePass']:
+        '''
+            algorithm, None when the pattern is not one-pass:
+                1. the one-pass states are the initial NFA state and every state a move leads to
+
+                2. for each of them, walk its epsilon closure and collect the tags on the way;
+                   reaching a state again with other tags means two ways to capture the same input,
+                   and the pattern is not one-pass (with the same tags the second path changes nothing)
+
+                3. every move of a state in the closure is an action on its symbol classes:
+                   the tags of the path to it and the state it leads to. Two actions on the same
+                   class, or two paths to acceptance, make the pattern not one-pass
+        '''
+        if nfa.n_states > MAX_ONE_PASS_STATES:
+            return None
+        # one-pass state i is NFA state entries[i]
+        entries = [nfa.initial]
+        index = {nfa.initial: 0}
+        actions, accepts = [], []
+        for entry in entries:
+            state_actions: Dict[int, Action] = {}
+            accept = None
+            # state -> tags of the first path to it
+            seen: Dict[int, Tuple[int, ...]] = {}
+            stack = [(entry, ())]
+            while stack:
+                state, path = stack.pop()
+                if state in tags:
+                    path = path + (tags[state],)
+                if state in seen:
+                    if seen[state] != path:
+                        return None
+                    continue
+                seen[state] = path
+                if nfa.acceptance >> state & 1:
+                    if accept is not None:
+                        return None
+                    accept = path
+                for class_id, destinations in nfa.moves[state].items():
+                    if class_id in state_actions or len(set(destinations)) > 1:
+                        return None
+                    destination = destinations[0]
+                    if destination not in index:
+                        index[destination] = len(entries)
+                        entries.append(destination)
+                    state_actions[class_id] = (path, index[destination])
+                stack.extend((next_state, path) for next_state in reversed(nfa.epsilon[state]))
+            actions.append(state_actions)
+            accepts.append(accept)
+        return cls(n_slots, nfa.alphabet, actions, accepts)
+
+    def slots(self, string: str, start: int, end: int) -> List[int]:
+        '''Capture slots of string[start:end], which must be a match of the pattern'''
+        slots = [-1] * self.n_slots
+        slots[0], slots[1] = start, end
+        actions = self.actions
+        table, lookup = self.alphabet.table, self.alphabet.lookup
+        state = 0
+        for i in range(start, end):
+            code = ord(string[i])
+            tags, state = actions[state][table[code] if code < LATIN1_SIZE else lookup(string[i])]
+            for tag in tags:
+                slots[tag] = i
+        for tag in self.accepts[state]:
+            slots[tag] = end
+        return slots
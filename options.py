@@ -0,0 +1,64 @@
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from fsm import FSM
+from metrics import CompileMetrics
+
+# A sink receives every intermediate automaton of a compile, e.g. sink('NFA', NFA)
+ArtifactSink = Callable[[str, FSM], None]
+# A metrics sink receives the stage timings and sizes of every compile, e.g. to export them
+MetricsSink = Callable[[CompileMetrics], None]
+
+@dataclass(frozen=True)
+class CompileLimits:
+    '''
+        Bounds on the resources of one compile, None for no bound. Going over one raises CompileLimitError;
+        the 'auto' engine falls back to 'pike' instead when a DFA limit is hit.
+    '''
+    # states of the Thompson NFA
+    nfa_states: Optional[int] = None
+    # states of the DFA built by subset construction
+    dfa_states: Optional[int] = None
+    # estimated bytes of the NFA and of the DFA under construction
+    memory_bytes: Optional[int] = None
+    # wall time of the whole compile
+    seconds: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class CompileOptions:
+    # Diagnostics are off by default, set a sink to receive the NFA, DFA and minimized DFA
+    debug_sink: Optional[ArtifactSink] = None
+    # 'hopcroft' for HopcroftMinimizer, O(n log n), or 'partition' for the quadratic Minimizer
+    minimizer: str = 'hopcroft'
+    # 'dfa' builds the whole minimized DFA at compile time,
+    # 'lazy' only builds the NFA and creates DFA states while matching (LazyDFA),
+    # 'pike' simulates the NFA without any determinization (PikeVM),
+    # 'auto' builds the DFA unless it needs more than dfa_state_limit states, then uses 'pike'
+    engine: str = 'dfa'
+    dfa_state_limit: int = 10000
+    # Maximum number of DFA states cached by the lazy engine
+    lazy_dfa_states: int = 10000
+    # Rewrite the syntax tree into an equivalent one with a smaller NFA before Thompson's construction
+    simplify: bool = True
+    limits: CompileLimits = CompileLimits()
+    # Called with the CompileMetrics of every compile (not of cache hits). It is not part of the cache key
+    metrics_sink: Optional[MetricsSink] = field(default=None, repr=False, compare=False)
+
+
+class ArtifactDirectory:
+    '''
+        Sink that writes every automaton as a PNG (using Graphviz) and a json file,
+        e.g. ArtifactDirectory('output', 'json') reproduces output/NFA.png and json/NFA.json
+    '''
+    def __init__(self, output_dir: str = 'output', json_dir: str = 'json', visualize: bool = True):
+        self.output_dir = output_dir
+        self.json_dir = json_dir
+        self.visualize = visualize
+
+    def __call__(self, name: str, fsm: FSM):
+        if self.visualize:
+            os.makedirs(self.output_dir, exist_ok=True)
+            fsm.visualize(os.path.join(self.output_dir, name))
+        os.makedirs(self.json_dir, exist_ok=True)
+        fsm.to_json(os.path.join(self.json_dir, f'{name}.json'))
@@ -0,0 +1,167 @@
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from itertools import repeat
+from multiprocessing import shared_memory
+from typing import Iterator, List, Optional, Tuple
+from dfa_table import DFATable
+from regex_parser import RegexParser
+from options import CompileOptions
+from literals import Prefilter
+from metrics import CompileMetrics
+from exceptions import ParserSyntaxError, CompileLimitError
+from stream import StreamMatcher, DEFAULT_CHUNK_SIZE
+
+Span = Tuple[int, int]
+
+# smallest chunk given to a worker, below it the stitching costs more than the scan
+MIN_CHUNK_SIZE = 1 << 20
+# chunks per worker, so a slow chunk does not leave the other workers idle
+CHUNKS_PER_WORKER = 4
+
+# state of a worker process, set once by _init_worker
+_worker_table: Optional[DFATable] = None
+_worker_data = None
+_worker_handle = None
+
+
+def _next_resume(span: Span) -> int:
+    # an empty match must not be reported twice at the same position
+    start, end = span
+    return end + 1 if start == end else end
+
+
+def _scan_region(table: DFATable, data, start: int, limit: int) -> Iterator[Span]:
+    '''
+        Matches starting in [start, limit), scanning from start as if nothing matched before it.
+        A match may end past limit, so the input after limit is read until no match attempt is left.
+    '''
+    matcher = StreamMatcher(table, start_limit=limit - start)
+    view = memoryview(data)
+    pos, n = start, len(view)
+    while pos < n:
+        if pos >= limit and matcher.idle: break
+        end = min(n, pos + DEFAULT_CHUNK_SIZE, limit) if pos < limit else min(n, pos + DEFAULT_CHUNK_SIZE)
+        for span_start, span_end in matcher.feed(view[pos:end]):
+            yield span_start + start, span_end + start
+        pos = end
+    for span_start, span_end in matcher.close():
+        yield span_start + start, span_end + start
+
+
+def _init_worker(table_bytes: bytes, filename: Optional[str], shm_name: Optional[str], size: int):
+    global _worker_table, _worker_data, _worker_handle
+    _worker_table = DFATable.from_buffer(table_bytes)
+    if filename is not None:
+        with open(filename, 'rb') as file:
+            _worker_handle = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        _worker_data = memoryview(_worker_handle)
+    else:
+        # the handle keeps the shared memory attached for the life of the worker
+        _worker_handle = shared_memory.SharedMemory(name=shm_name)
+        _worker_data = _worker_handle.buf[:size]
+
+
+def _scan_chunk(start: int, limit: int) -> List[Span]:
+    return list(_scan_region(_worker_table, _worker_data, start, limit))
+
+
+def _chunk_bounds(size: int, chunk_size: int) -> List[Tuple[int, int]]:
+    # the last chunk also lets a match start at the very end (an empty match)
+    starts = list(range(0, size, chunk_size)) or [0]
+    return list(zip(starts, starts[1:] + [size + 1]))
+
+
+def finditer_parallel(table: DFATable, source, workers: Optional[int] = None,
+                      chunk_size: Optional[int] = None) -> Iterator[Span]:
+    '''
+        Spans of the matches in a large input, scanned in chunks by a pool of processes,
+        the same spans as finditer_stream. The source is a file name or a bytes-like object
+        (bytes are matched as Latin-1 and offsets count bytes).
+
+        algorithm (speculative chunks, then stitching):
+            1. the DFA goes to every worker once, in its binary format; a file is mapped by every
+               worker, other inputs are copied once into shared memory
+            2. a worker scans its chunk as if no match was running at the chunk start and returns the
+               matches starting in the chunk; a match may end in a later chunk
+            3. the chunks are stitched in order. After the last match of the previous chunks scanning
+               resumes at some position r. If r is not inside the chunk, its matches are already exact.
+               Otherwise a match ended past the chunk start and the chunk is scanned again from r until
+               the scan resumes where the worker's scan also resumed; from there both scans agree
+    '''
+    workers = workers if workers is not None else os.cpu_count() or 1
+    filename, shm = None, None
+    if isinstance(source, (str, os.PathLike)):
+        filename = os.fspath(source)
+        size = os.path.getsize(filename)
+        with open(filename, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+    else:
+        data = memoryview(source).cast('B')
+        size = len(data)
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shm.buf[:size] = data
+
+    if chunk_size is None:
+        chunk_size = max(MIN_CHUNK_SIZE, -(-size // (workers * CHUNKS_PER_WORKER)))
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(table.to_bytes(), filename, shm and shm.name, size)) as executor:
+            bounds = _chunk_bounds(size, chunk_size)
+            futures = [executor.submit(_scan_chunk, start, limit) for start, limit in bounds]
+            resume = 0
+            for (start, limit), future in zip(bounds, futures):
+                spans = future.result()
+                if resume > start:
+                    # worker's resume position -> index of its next match
+                    following = {start: 0}
+                    following.update((_next_resume(span), i + 1) for i, span in enumerate(spans))
+                    if resume in following:
+                        spans = spans[following[resume]:]
+                    else:
+                        for span in _scan_region(table, data, resume, limit):
+                            yield span
+                            resume = _next_resume(span)
+                            if resume in following:
+                                spans = spans[following[resume]:]
+                                break
+                        else:
+                            spans = []
+                yield from spans
+                if spans:
+                    resume = _next_resume(spans[-1])
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+CompiledTable = Tuple[Optional[bytes], Optional[Prefilter], Optional[CompileMetrics], Optional[Exception]]
+
+def _compile_table(parser: RegexParser, pattern: str, options: CompileOptions) -> CompiledTable:
+    '''
+        Runs in a worker process: the DFA of the pattern in binary form with its prefilter and metrics,
+        no DFA when the 'auto' engine chose the Pike VM, or the error compile raised
+    '''
+    try:
+        _, engine, metrics = parser.compile(pattern, options)
+    except (ParserSyntaxError, CompileLimitError) as e:
+        return None, None, None, e
+    if not isinstance(engine, DFATable):
+        return None, None, metrics, None
+    return engine.to_bytes(), engine.prefilter, metrics, None
+
+def compile_tables(parser: RegexParser, patterns: List[str], options: CompileOptions,
+                   workers: Optional[int] = None) -> List[CompiledTable]:
+    '''
+        Compiles every pattern in a pool of worker processes, determinization is CPU-bound so threads
+        would not help. Options are sent without their sinks, which usually are not picklable:
+        the caller passes the metrics on.
+    '''
+    workers = workers or os.cpu_count() or 1
+    options = replace(options, debug_sink=None, metrics_sink=None)
+    # a few patterns per task, so thousands of small patterns are not sent one by one
+    chunksize = max(1, len(patterns) // (workers * CHUNKS_PER_WORKER))
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(_compile_table, repeat(parser), patterns, repeat(options), chunksize=chunksize))
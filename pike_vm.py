@@ -0,0 +1,116 @@
+from array import array
+from typing import Optional
+from compact_nfa import CompactNFA
+from alphabet import LATIN1_SIZE
+from engine import Engine
+from match import Match
+from literals import LiteralFinder
+
+class SparseSet:
+    '''
+        Set of NFA states with O(1) insert, membership and clear (Briggs & Torczon).
+        starts[i] is the position where the thread in dense[i] started.
+    '''
+    def __init__(self, capacity: int):
+        self.dense = array('i', [0]) * capacity
+        self.sparse = array('i', [0]) * capacity
+        self.starts = array('i', [0]) * capacity
+        self.size = 0
+
+    def __contains__(self, state: int) -> bool:
+        index = self.sparse[state]
+        return index < self.size and self.dense[index] == state
+
+    def add(self, state: int, start: int):
+        self.sparse[state] = self.size
+        self.dense[self.size] = state
+        self.starts[self.size] = start
+        self.size += 1
+
+    def clear(self):
+        self.size = 0
+
+
+class PikeVM(Engine):
+    '''
+        Simulates the Thompson NFA directly with two lists of threads (current and next position),
+        so there is no determinization at all: compile time is linear in the pattern and matching
+        is O(n * m) for an input of length n and an NFA of m states.
+    '''
+    nfa: CompactNFA
+
+    def __init__(self, nfa: CompactNFA):
+        self.nfa = nfa
+
+    # Add a thread and every state reachable from it by epsilon moves, unless a thread that
+    # started earlier is already there (it has the same future and wins leftmost-longest)
+    def _add_thread(self, threads: SparseSet, state: int, start: int):
+        if state in threads: return
+        epsilon = self.nfa.epsilon
+        threads.add(state, start)
+        stack = [state]
+        while stack:
+            for next_state in epsilon[stack.pop()]:
+                if next_state not in threads:
+                    threads.add(next_state, start)
+                    stack.append(next_state)
+
+    def _scan(self, string: str, pos: int, endpos: int, anchored: bool) -> Optional[Match]:
+        '''
+            algorithm (leftmost-longest, one pass):
+                1. the current list holds the threads alive before string[i], in order of their start
+                2. unless a match was already found, a new thread starts at i (after the older ones)
+                3. accepting threads record a match, the leftmost start wins and then the longest end;
+                   once there is a match, threads that started after it are dropped
+                4. every thread moves on string[i] into the next list
+        '''
+        nfa = self.nfa
+        moves, acceptance = nfa.moves, nfa.acceptance
+        table, lookup = nfa.alphabet.table, nfa.alphabet.lookup
+        current, following = SparseSet(nfa.n_states), SparseSet(nfa.n_states)
+        best_start = best_end = -1
+
+        i = pos
+        while True:
+            if best_start < 0 and (i == pos or not anchored):
+                self._add_thread(current, nfa.initial, i)
+
+            for k in range(current.size):
+                if acceptance >> current.dense[k] & 1:
+                    start = current.starts[k]
+                    if best_start < 0 or start < best_start or (start == best_start and i > best_end):
+                        best_start, best_end = start, i
+
+            if i >= endpos:
+                break
+            # with no threads left, only an unanchored search without a match goes on
+            if current.size == 0 and (anchored or best_start >= 0):
+                break
+
+            code = ord(string[i])
+            class_id = table[code] if code < LATIN1_SIZE else lookup(string[i])
+            following.clear()
+            for k in range(current.size):
+                start = current.starts[k]
+                if best_start >= 0 and start > best_start:
+                    continue
+                for next_state in moves[current.dense[k]].get(class_id, ()):
+                    self._add_thread(following, next_state, start)
+            current, following = following, current
+            i += 1
+
+        return self._match(string, best_start, best_end) if best_start >= 0 else None
+
+    def longest_match(self, string: str, pos: int, endpos: int) -> int:
+        match = self._scan(string, pos, endpos, anchored=True)
+        return match.end() if match else -1
+
+    def _search(self, string: str, pos: int, endpos: int, finder: Optional[LiteralFinder]) -> Optional[Match]:
+        if finder is not None:
+            # no match starts before the first candidate
+            pos = finder.next(pos)
+            if pos < 0: return None
+        match = self._scan(string, pos, endpos, anchored=False)
+        if match is not None and finder is not None and match.start() == pos:
+            finder.hit()
+        return match
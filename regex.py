@@ -1,30 +1,210 @@
+from dataclasses import replace
+from concurrent.futures import Executor
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union
 from regex_parser import RegexParser
-from fsm import FSM
-from exceptions import ParserSyntaxError
+from automaton import NFA
+from dfa_table import DFATable
+from engine import Engine
+from match import Match
+from options import CompileOptions
+import cache
+from exceptions import ParserSyntaxError, CompileLimitError
+from literals import Prefilter
+from metrics import CompileMetrics
+import stream
+import parallel
+import batch
+import async_match
 
 class Regex:
     _pattern: str
-    _fsm: FSM
+    _options: CompileOptions
+    # The minimized DFA, or the NFA for engines working on it (to_fsm gives the FSM view)
+    _automaton: Union[NFA, DFATable]
+    # None when the pattern was loaded from the disk cache
+    _metrics: Optional[CompileMetrics] = None
+    _engine: Engine = None
     
-    _parser: RegexParser
+    # RegexParser keeps no state between compiles, so one parser is shared by every thread
+    _parser: RegexParser = RegexParser()
     
     @classmethod
     def set_parser(cls, parser: RegexParser):
         cls._parser = parser
     
-    def __init__(self, pattern: str):
+    def __init__(self, pattern: str, options: CompileOptions = None):
         self._pattern = pattern
+        self._options = options if options is not None else CompileOptions()
         
     @property
     def pattern(self):
         return self._pattern
     
     def compile(self) -> Exception:
+        # Compiling with a debug sink always runs the full pipeline so the sink sees every stage
+        use_cache = self._options.debug_sink is None
+        if use_cache and self._load_cached():
+            return None
         try:
-            self._fsm = self._parser.parse(self._pattern)
-        except ParserSyntaxError as e:
+            compiled = self._parser.compile(self._pattern, self._options)
+        except (ParserSyntaxError, CompileLimitError) as e:
             return e
+        self._set(*compiled)
+        if use_cache:
+            self._store()
+
+    @classmethod
+    def compile_many(cls, patterns: Iterable[str], options: CompileOptions = None,
+                     workers: Optional[int] = None) -> List[Union['Regex', Exception]]:
+        '''
+            Compiles a rule set at once: the DFAs of the patterns missing from the caches are built in
+            a pool of worker processes and sent back in the binary format of DFATable.
+            Returns the compiled Regex of every pattern, or the error its compile returned.
+            The 'lazy' and 'pike' engines, and compiles with a debug sink, run in this process.
+        '''
+        regexes = [cls(pattern, options) for pattern in patterns]
+        options = options if options is not None else CompileOptions()
+        pool = options.engine in ('dfa', 'auto') and options.debug_sink is None
+        # one Regex per distinct pattern goes to the pool, the others find it in the pattern cache
+        pending = {}
+        for regex in regexes:
+            if pool and regex.pattern not in pending and not regex._load_cached():
+                pending[regex.pattern] = regex
+
+        errors = {}
+        compiled = parallel.compile_tables(cls._parser, list(pending), options, workers) if pending else []
+        for regex, (table_bytes, prefilter, metrics, error) in zip(pending.values(), compiled):
+            if error is not None:
+                errors[id(regex)] = error
+                continue
+            if options.metrics_sink is not None and metrics is not None:
+                options.metrics_sink(metrics)
+            if table_bytes is None:
+                # 'auto' chose the Pike VM, which has no binary form: build it here without retrying the DFA
+                automaton, engine, _ = cls._parser.compile(regex.pattern, replace(options, engine='pike', metrics_sink=None))
+                regex._set(automaton, engine, metrics)
+            else:
+                table = DFATable.from_buffer(table_bytes)
+                table.prefilter = prefilter
+                table.captures = cls._parser.captures(regex.pattern, options)
+                regex._set(table, table, metrics)
+            regex._store()
+
+        for regex in regexes:
+            if regex._engine is None and id(regex) not in errors:
+                error = regex.compile()
+                if error is not None:
+                    errors[id(regex)] = error
+        return [errors.get(id(regex), regex) for regex in regexes]
+
+    # From the pattern cache, or the disk cache where the table is the minimized DFA itself
+    def _load_cached(self) -> bool:
+        key = (self._pattern, self._options)
+        compiled = cache._cache.get(key)
+        if compiled is None:
+            disk_cache = cache.disk_cache() if self._options.engine in ('dfa', 'auto') else None
+            table = disk_cache.get(self._pattern, self._options) if disk_cache else None
+            if table is None:
+                return False
+            table.prefilter = self._parser.prefilter(self._pattern)
+            table.captures = self._parser.captures(self._pattern, self._options)
+            compiled = (table, table, None)
+            cache._cache.put(key, compiled)
+        self._set(*compiled)
+        return True
+
+    # The engine is set last, so another thread never sees a compiled Regex without its automaton
+    def _set(self, automaton: Union[NFA, DFATable], engine: Engine, metrics: Optional[CompileMetrics]):
+        self._automaton, self._metrics = automaton, metrics
+        self._engine = engine
+
+    def _store(self):
+        cache._cache.put((self._pattern, self._options), (self._automaton, self._engine, self._metrics))
+        disk_cache = cache.disk_cache()
+        if disk_cache and isinstance(self._engine, DFATable):
+            disk_cache.put(self._pattern, self._options, self._engine)
+    
+    def _compiled(self) -> Engine:
+        if self._engine is None:
+            err = self.compile()
+            if err: raise err
+        return self._engine
+    
+    # The literal prefilter used by search and finditer, with its hit rate; None without literals
+    @property
+    def prefilter(self) -> Optional[Prefilter]:
+        return self._compiled().prefilter
+
+    # Number of capturing groups, as re.Pattern.groups
+    @property
+    def groups(self) -> int:
+        captures = self._compiled().captures
+        return captures.n_groups if captures is not None else 0
+
+    # Timings and sizes of every compile stage, None when the pattern was loaded from the disk cache
+    @property
+    def metrics(self) -> Optional[CompileMetrics]:
+        self._compiled()
+        return self._metrics
+
+    # Match at the beginning of the string only
+    def match(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Match]:
+        return self._compiled().match(string, pos, endpos)
+    
+    # Match the whole string
+    def fullmatch(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Match]:
+        return self._compiled().fullmatch(string, pos, endpos)
         
-    def search(self, string: str):
-        pass
-        
\ No newline at end of file
+    # Find the leftmost match anywhere in the string
+    def search(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Optional[Match]:
+        return self._compiled().search(string, pos, endpos)
+    
+    # Iterate over all non-overlapping matches
+    def finditer(self, string: str, pos: int = 0, endpos: Optional[int] = None) -> Iterator[Match]:
+        return self._compiled().finditer(string, pos, endpos)
+    
+    # Spans of all non-overlapping matches in a stream: str or bytes chunks, a binary file or an mmap
+    def finditer_stream(self, source, chunk_size: int = stream.DEFAULT_CHUNK_SIZE,
+                        encoding: Optional[str] = None) -> Iterator[Tuple[int, int]]:
+        engine = self._compiled()
+        if not isinstance(engine, DFATable):
+            raise ValueError("Streaming needs a compiled DFA, use the 'dfa' engine")
+        return stream.finditer_stream(engine, source, chunk_size, encoding)
+
+    # Async search and finditer, giving the event loop a turn every step_budget characters,
+    # or running in the executor (a thread or a process pool) when one is given
+    async def asearch(self, string: str, pos: int = 0, endpos: Optional[int] = None,
+                      step_budget: int = async_match.DEFAULT_STEP_BUDGET,
+                      executor: Optional[Executor] = None) -> Optional[Match]:
+        return await async_match.asearch(self._compiled(), string, pos, endpos, step_budget, executor)
+
+    def afinditer(self, string: str, pos: int = 0, endpos: Optional[int] = None,
+                  step_budget: int = async_match.DEFAULT_STEP_BUDGET,
+                  executor: Optional[Executor] = None) -> AsyncIterator[Match]:
+        return async_match.afinditer(self._compiled(), string, pos, endpos, step_budget, executor)
+
+    # Spans of the matches in an asyncio.StreamReader or an async iterable of chunks; the executor
+    # must be a thread pool, the stream matcher cannot be shared with another process
+    def afinditer_stream(self, source, chunk_size: int = stream.DEFAULT_CHUNK_SIZE, encoding: Optional[str] = None,
+                         step_budget: int = async_match.DEFAULT_STEP_BUDGET,
+                         executor: Optional[Executor] = None) -> AsyncIterator[Tuple[int, int]]:
+        engine = self._compiled()
+        if not isinstance(engine, DFATable):
+            raise ValueError("Streaming needs a compiled DFA, use the 'dfa' engine")
+        return async_match.afinditer_stream(engine, source, chunk_size, encoding, step_budget, executor)
+
+    # Whether each string matches as a whole: a NumPy bool array, or a list of bools without NumPy
+    def fullmatch_many(self, strings: Iterable[str]):
+        return batch.fullmatch_many(self._compiled(), strings)
+
+    # Whether a match starts at the beginning of each string
+    def match_many(self, strings: Iterable[str]):
+        return batch.match_many(self._compiled(), strings)
+
+    def finditer_parallel(self, source, workers: Optional[int] = None,
+                          chunk_size: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        engine = self._compiled()
+        if not isinstance(engine, DFATable):
+            raise ValueError("Parallel scanning needs a compiled DFA, use the 'dfa' engine")
+        return parallel.finditer_parallel(engine, source, workers, chunk_size)
+
@@ -0,0 +1,88 @@
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple, TypeVar, Union
+
+# [start, end) of a node in the pattern
+Span = Tuple[int, int]
+# inclusive range of characters, ('a', 'a') for a single one
+CharRange = Tuple[str, str]
+
+# Spans are left out of equality, so equal subtrees compare equal wherever they are in the pattern
+
+@dataclass(frozen=True)
+class Literal:
+    char: str
+    span: Span = field(default=(0, 0), compare=False)
+
+
+@dataclass(frozen=True)
+class CharSet:
+    ranges: Tuple[CharRange, ...]
+    span: Span = field(default=(0, 0), compare=False)
+
+
+@dataclass(frozen=True)
+class Concat:
+    items: Tuple['Node', ...]
+    span: Span = field(default=(0, 0), compare=False)
+
+
+@dataclass(frozen=True)
+class Alternate:
+    items: Tuple['Node', ...]
+    span: Span = field(default=(0, 0), compare=False)
+
+
+@dataclass(frozen=True)
+class Repeat:
+    node: 'Node'
+    min: int
+    # None for no upper bound
+    max: Optional[int]
+    span: Span = field(default=(0, 0), compare=False)
+
+
+@dataclass(frozen=True)
+class Group:
+    '''A capturing group, index is its number in the pattern counting from 1'''
+    node: 'Node'
+    index: int
+    span: Span = field(default=(0, 0), compare=False)
+
+
+Node = Union[Literal, CharSet, Concat, Alternate, Repeat, Group]
+
+T = TypeVar('T')
+
+
+def children(node: Node) -> Tuple[Node, ...]:
+    if isinstance(node, (Concat, Alternate)):
+        return node.items
+    if isinstance(node, (Repeat, Group)):
+        return (node.node,)
+    return ()
+
+
+def fold(root: Node, visit: Callable[[Node, List[T]], T]) -> T:
+    '''
+        Bottom-up evaluation of the tree: visit(node, results of its children).
+        Iterative, so deeply nested patterns do not hit the recursion limit.
+    '''
+    results: List[T] = []
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        nodes = children(node)
+        if expanded or not nodes:
+            first = len(results) - len(nodes)
+            values = results[first:]
+            del results[first:]
+            results.append(visit(node, values))
+        else:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(nodes))
+    return results[0]
+
+
+# Number of nodes in the tree
+def size(root: Node) -> int:
+    return fold(root, lambda node, sizes: 1 + sum(sizes))
@@ -1,42 +1,269 @@
+import time
+from typing import List, Optional, Tuple, Union
 from fsm import FSM
+from automaton import NFA as NFAutomaton
 from minimizer import Minimizer
-from shunting_yard import ShuntingYard
+from hopcroft import HopcroftMinimizer
 from thompson import Thompson
-from preprocessor import RegexPreprocessor
+from ast_parser import AstParser
+from regex_ast import Node, size
+from simplify import simplify, SimplifyReport
 from subset_construction import SubsetConstruction
+from options import CompileOptions
+from compact_nfa import CompactNFA
+from dfa_table import DFATable
+from lazy_dfa import LazyDFA
+from pike_vm import PikeVM
+from engine import Engine
+from alphabet import Alphabet
+from exceptions import CompileLimitError
+from literals import Prefilter, analyze
+from captures import Captures
+from metrics import CompileMetrics
+
+# Bump whenever the compiled automata change, it invalidates on-disk caches
+COMPILER_VERSION = '4'
+
+# The reverse DFA is optional, its states are bounded by a multiple of the forward DFA (but at least
+# MIN_REVERSE_STATES) within dfa_state_limit, so a pattern with a small DFA never compiles slowly for it
+REVERSE_STATES_FACTOR = 4
+MIN_REVERSE_STATES = 256
+
+# What compile hands back next to the engine: the NFA, or the minimized DFA for the DFA engines
+Automaton = Union[NFAutomaton, DFATable]
 
 class RegexParser:
-    def parse(self, regex: str) -> FSM:
-        processed_regex = RegexPreprocessor.preprocess(regex)
+    # Returns the automaton of the last stage that ran, the engine matching with it
+    # and the timings and sizes of every stage
+    def compile(self, regex: str, options: CompileOptions = None) -> Tuple[Automaton, Engine, CompileMetrics]:
+        options = options if options is not None else CompileOptions()
+        metrics = CompileMetrics(regex, options.engine)
+        seconds = options.limits.seconds
+        deadline = time.perf_counter() + seconds if seconds is not None else None
+        try:
+            tree = self.parse_tree(regex, metrics)
+            ast = self.simplify_AST(tree, options, metrics)
+            self._check_deadline(deadline, 'parse')
+            automaton, engine = self._compile(ast, options, metrics, deadline)
+        except CompileLimitError as e:
+            e.metrics = metrics
+            raise
+        engine.prefilter = Prefilter.from_info(analyze(ast))
+        # groups are dropped by simplification, the captures work on the tree as parsed
+        engine.captures = Captures.from_tree(tree, options.limits)
+        if options.metrics_sink is not None:
+            options.metrics_sink(metrics)
+        return automaton, engine, metrics
 
-        NFA = self.regex_to_NFA(processed_regex)
-        NFA.visualize('output/NFA')
-        NFA.to_json('json/NFA.json')
+    def _compile(self, ast: Node, options: CompileOptions, metrics: CompileMetrics,
+                 deadline: Optional[float]) -> Tuple[Automaton, Engine]:
+        if options.engine == 'lazy':
+            NFA = self.build_NFA(ast, options, metrics)
+            nfa = self.compact_NFA(NFA, None, metrics)
+            # search finds the start of a match with the lazy DFA of the reversed NFA
+            reverse = self.compact_NFA(NFA.reversed(), nfa.alphabet, metrics, 'reverse_compact_nfa')
+            return NFA, LazyDFA(nfa, options.lazy_dfa_states, LazyDFA(reverse, options.lazy_dfa_states))
+        if options.engine == 'pike':
+            NFA = self.build_NFA(ast, options, metrics)
+            return NFA, PikeVM(self.compact_NFA(NFA, None, metrics))
+        if options.engine == 'auto':
+            NFA = self.build_NFA(ast, options, metrics)
+            alphabet = self.compress_alphabet(NFA, metrics)
+            max_states = options.dfa_state_limit
+            if options.limits.dfa_states is not None:
+                max_states = min(max_states, options.limits.dfa_states)
+            try:
+                self._check_deadline(deadline, 'thompson')
+                DFA_min = self.determinize(NFA, options, alphabet, max_states, metrics, deadline)
+            except CompileLimitError:
+                # the NFA is within its limits and all the pike engine needs
+                metrics.engine = 'pike'
+                return NFA, PikeVM(self.compact_NFA(NFA, alphabet, metrics))
+            metrics.engine = 'dfa'
+            DFA_min.reverse = self.reverse_DFA(NFA, DFA_min, options, alphabet, metrics, deadline)
+            return DFA_min, DFA_min
+        if options.engine == 'dfa':
+            NFA = self.build_NFA(ast, options, metrics)
+            alphabet = self.compress_alphabet(NFA, metrics)
+            self._check_deadline(deadline, 'thompson')
+            DFA_min = self.determinize(NFA, options, alphabet, options.limits.dfa_states, metrics, deadline)
+            DFA_min.reverse = self.reverse_DFA(NFA, DFA_min, options, alphabet, metrics, deadline)
+            return DFA_min, DFA_min
+        raise ValueError(f"Unknown engine {options.engine}")
 
-        DFA = self.NFA_to_DFA(NFA)
-        DFA.visualize('output/DFA')
-        DFA.to_json('json/DFA.json')
+    # The minimized DFA as an FSM, e.g. to visualize it
+    def parse(self, regex: str, options: CompileOptions = None) -> FSM:
+        options = options if options is not None else CompileOptions()
+        NFA = self.parse_NFA(regex, options)
+        return self.determinize(NFA, options, self.compress_alphabet(NFA)).to_fsm()
 
-        DFA_min = self.minimize_DFA(DFA)
-        DFA_min.visualize('output/minimized_DFA')
-        DFA_min.to_json('json/minimized_DFA.json')
+    # NFA -> minimized DFA, both defined over the symbol classes of the alphabet
+    def determinize(self, NFA: NFAutomaton, options: CompileOptions, alphabet: Alphabet,
+                    max_states: int = None, metrics: CompileMetrics = None, deadline: float = None) -> DFATable:
+        DFA = self.NFA_to_DFA(NFA, max_states, alphabet, metrics, options.limits.memory_bytes, deadline)
+        self._dump(options, 'DFA', DFA)
+
+        DFA_min = self.minimize_DFA(DFA, options.minimizer, metrics, deadline)
+        self._dump(options, 'minimized_DFA', DFA_min)
 
         return DFA_min
-    
-    def regex_to_NFA(self, regex: str) -> FSM:
-        operators = {'*':0, '+':0, '?':0, '&': 1, '-': 1, '|': 2}
-        shunting_yard = ShuntingYard(operators)
-        postfix = shunting_yard.parse(regex)
-        thompson = Thompson()
-        NFA = thompson.construct_NFA(postfix)
+
+    def reverse_DFA(self, NFA: NFAutomaton, DFA: DFATable, options: CompileOptions, alphabet: Alphabet,
+                    metrics: CompileMetrics = None, deadline: float = None) -> Optional[DFATable]:
+        '''
+            Minimized DFA of the reversed pattern, which search runs backwards from the end of a match
+            to find its start. It is only an accelerator: None when it needs more states than its budget
+            (see REVERSE_STATES_FACTOR) or does not fit the limits, search then tries every start position.
+        '''
+        max_states = min(max(REVERSE_STATES_FACTOR * DFA.n_states, MIN_REVERSE_STATES), options.dfa_state_limit)
+        if options.limits.dfa_states is not None:
+            max_states = min(max_states, options.limits.dfa_states)
+        try:
+            reverse = self.NFA_to_DFA(NFA.reversed(), max_states, alphabet, metrics, options.limits.memory_bytes,
+                                      deadline, 'reverse_subset_construction')
+            # Hopcroft whatever the forward minimizer, the reverse DFA must not double the cost of a compile
+            return self.minimize_DFA(reverse, 'hopcroft', metrics, deadline, 'reverse_minimize')
+        except CompileLimitError:
+            return None
+
+    def parse_NFA(self, regex: str, options: CompileOptions = None) -> NFAutomaton:
+        options = options if options is not None else CompileOptions()
+        return self.build_NFA(self.parse_AST(regex, options), options)
+
+    def build_NFA(self, ast: Node, options: CompileOptions, metrics: CompileMetrics = None) -> NFAutomaton:
+        started = time.perf_counter()
+        limits = options.limits
+        # counted repetition can make a small pattern a huge NFA, checked from its size before building it
+        NFA = self.ast_to_NFA(ast, limits.nfa_states)
+        if metrics is not None:
+            metrics.add('thompson', started, NFA.n_states, NFA.n_transitions, bytes=NFA.nbytes)
+        if limits.nfa_states is not None and NFA.n_states > limits.nfa_states:
+            raise CompileLimitError(f"NFA exceeds {limits.nfa_states} states", 'nfa_states', NFA.n_states)
+        if limits.memory_bytes is not None and NFA.nbytes > limits.memory_bytes:
+            raise CompileLimitError(f"NFA exceeds {limits.memory_bytes} bytes", 'memory_bytes', NFA.nbytes)
+        self._dump(options, 'NFA', NFA)
         return NFA
+
+    # Syntax tree of the pattern, raises ParserSyntaxError with the position of the error
+    def parse_AST(self, regex: str, options: CompileOptions = None, metrics: CompileMetrics = None) -> Node:
+        return self.simplify_AST(self.parse_tree(regex, metrics), options, metrics)
+
+    # The tree as written, with its capturing groups
+    def parse_tree(self, regex: str, metrics: CompileMetrics = None) -> Node:
+        started = time.perf_counter()
+        tree = AstParser().parse(regex)
+        if metrics is not None:
+            metrics.add('parse', started, nodes=size(tree))
+        return tree
+
+    def simplify_AST(self, tree: Node, options: CompileOptions = None, metrics: CompileMetrics = None) -> Node:
+        options = options if options is not None else CompileOptions()
+        if not options.simplify:
+            return tree
+        started = time.perf_counter()
+        ast = simplify(tree)
+        if metrics is not None:
+            metrics.add('simplify', started, nodes=size(ast))
+        return ast
+
+    # Group finder of the pattern, None without capturing groups; only parses, the engines are built on first use
+    def captures(self, regex: str, options: CompileOptions = None) -> Optional[Captures]:
+        options = options if options is not None else CompileOptions()
+        return Captures.from_tree(self.parse_tree(regex), options.limits)
+
+    # NFA states of the pattern without and with simplification
+    def simplify_report(self, regex: str) -> SimplifyReport:
+        ast = AstParser().parse(regex)
+        before = self.ast_to_NFA(ast).n_states
+        after = self.ast_to_NFA(simplify(ast)).n_states
+        return SimplifyReport(before, after)
+    
+    def _check_deadline(self, deadline: Optional[float], stage: str):
+        if deadline is not None and time.perf_counter() > deadline:
+            raise CompileLimitError(f"Compile ran out of time after {stage}", 'seconds', stage)
+
+    # Intermediate automata are only converted to FSMs and handed out when a debug sink was requested
+    def _dump(self, options: CompileOptions, name: str, automaton: Automaton):
+        if options.debug_sink is not None:
+            options.debug_sink(name, automaton.to_fsm())
+    
+    def parse_set_NFA(self, regexes: List[str], options: CompileOptions = None) -> Tuple[NFAutomaton, List[int]]:
+        '''
+            Union of the NFAs of every regex, also returns the acceptance state of each regex
+            so matches can be traced back to the regex they belong to
+        '''
+        if not regexes: raise ValueError("Empty regex set")
+        options = options if options is not None else CompileOptions()
+        # every regex is a fragment of the same NFA
+        thompson = Thompson(options.limits.nfa_states)
+        fragments = [thompson.fragment(self.parse_AST(regex, options)) for regex in regexes]
+        ends = [fragment.acceptance for fragment in fragments]
+
+        NFA = thompson.builder.build(thompson.union(*fragments).initial, ends)
+        limits = options.limits
+        if limits.memory_bytes is not None and NFA.nbytes > limits.memory_bytes:
+            raise CompileLimitError(f"NFA exceeds {limits.memory_bytes} bytes", 'memory_bytes', NFA.nbytes)
+        self._dump(options, 'NFA', NFA)
+        return NFA, ends
+    
+    # Literals every match starts with or contains, used by search to skip ahead with str.find
+    def prefilter(self, regex: str) -> Optional[Prefilter]:
+        return Prefilter.from_info(analyze(self.parse_AST(regex)))
+
+    def regex_to_NFA(self, regex: str) -> NFAutomaton:
+        return self.ast_to_NFA(self.parse_AST(regex))
+
+    def ast_to_NFA(self, ast: Node, max_states: int = None) -> NFAutomaton:
+        return Thompson(max_states).construct_NFA(ast)
+    
+    # Split the characters of every action of the pattern into disjoint symbol classes
+    def compress_alphabet(self, NFA: NFAutomaton, metrics: CompileMetrics = None) -> Alphabet:
+        started = time.perf_counter()
+        alphabet = Alphabet.from_nfa(NFA)
+        if metrics is not None:
+            metrics.add('alphabet', started, classes=alphabet.size)
+        return alphabet
+
+    # Bitset view of the NFA for the engines that simulate it
+    def compact_NFA(self, NFA: NFAutomaton, alphabet: Alphabet = None, metrics: CompileMetrics = None,
+                    stage: str = 'compact_nfa') -> CompactNFA:
+        started = time.perf_counter()
+        nfa = CompactNFA(NFA, alphabet)
+        if metrics is not None:
+            metrics.add(stage, started, nfa.n_states, NFA.n_transitions, closures=nfa.n_closures)
+        return nfa
     
-    def NFA_to_DFA(self, NFA: FSM) -> FSM:
-        power_set = SubsetConstruction()
-        DFA = power_set.execute(NFA)
+    def NFA_to_DFA(self, NFA: NFAutomaton, max_states: int = None, alphabet: Alphabet = None,
+                   metrics: CompileMetrics = None, max_bytes: int = None, deadline: float = None,
+                   stage: str = 'subset_construction') -> DFATable:
+        started = time.perf_counter()
+        power_set = SubsetConstruction(max_states, max_bytes, deadline)
+        try:
+            DFA = power_set.execute(NFA, alphabet)
+        except CompileLimitError:
+            # the aborted stage is recorded too, with the memory it reached
+            if metrics is not None:
+                metrics.add(stage, started, power_set.n_states, 0, closures=power_set.n_closures,
+                            nfa_states_visited=power_set.nfa_states_visited,
+                            estimated_bytes=power_set.estimated_bytes, aborted=1)
+            raise
+        if metrics is not None:
+            metrics.add(stage, started, DFA.n_states, DFA.n_transitions,
+                        closures=power_set.n_closures, nfa_states_visited=power_set.nfa_states_visited,
+                        estimated_bytes=power_set.estimated_bytes)
         return DFA
     
-    def minimize_DFA(self, DFA: FSM) -> FSM:
-        minimizer = Minimizer()
+    def minimize_DFA(self, DFA: DFATable, algorithm: str = 'hopcroft', metrics: CompileMetrics = None,
+                     deadline: float = None, stage: str = 'minimize') -> DFATable:
+        started = time.perf_counter()
+        if algorithm == 'partition':
+            minimizer = Minimizer(deadline)
+        elif algorithm == 'hopcroft':
+            minimizer = HopcroftMinimizer(deadline)
+        else:
+            raise ValueError(f"Unknown minimizer {algorithm}")
         minimized_DFA = minimizer.execute(DFA)
+        if metrics is not None:
+            counters = {'rounds': minimizer.rounds} if algorithm == 'partition' else {'splitters': minimizer.splitters}
+            metrics.add(stage, started, minimized_DFA.n_states, minimized_DFA.n_transitions, **counters)
         return minimized_DFA
\ No newline at end of file
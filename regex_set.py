@@ -0,0 +1,169 @@
+import time
+from array import array
+from typing import FrozenSet, List, Optional, Tuple
+from regex_parser import RegexParser
+from compact_nfa import CompactNFA
+from dfa_table import DFATable
+from hopcroft import HopcroftMinimizer
+from alphabet import LATIN1_SIZE
+from options import CompileOptions
+from exceptions import ParserSyntaxError, CompileLimitError, StateLimitError
+from subset_construction import STATE_OVERHEAD
+
+class SetDFA:
+    '''
+        DFA of a union of regexes where every state knows which regexes it accepts.
+        An unanchored SetDFA restarts every regex at every position, so one pass over
+        the input finds every regex that matches anywhere in it.
+    '''
+    table: DFATable
+    # pattern_ids[s]: the regexes accepted in state s
+    pattern_ids: List[FrozenSet[int]]
+    unanchored: bool
+    # number of regexes that can match at all
+    n_patterns: int
+
+    def __init__(self, table: DFATable, pattern_ids: List[FrozenSet[int]], unanchored: bool):
+        self.table = table
+        self.pattern_ids = pattern_ids
+        self.unanchored = unanchored
+        self.n_patterns = len(frozenset().union(*pattern_ids))
+
+    @classmethod
+    def from_nfa(cls, nfa: CompactNFA, ends: List[int], unanchored: bool, max_states: Optional[int] = None,
+                 max_bytes: Optional[int] = None, deadline: Optional[float] = None) -> 'SetDFA':
+        '''
+            Subset construction over the symbol classes where the label of a DFA state is the set of
+            regexes whose acceptance state it contains, then Hopcroft minimization that only merges
+            states with the same label. An unanchored DFA adds the start state to every next state.
+            The states, estimated bytes and deadline are checked as in SubsetConstruction.
+        '''
+        end_of = {state: pattern for pattern, state in enumerate(ends)}
+        ends_mask = 0
+        for state in ends:
+            ends_mask |= 1 << state
+        restart = nfa.start if unanchored else 0
+        n_classes = nfa.alphabet.size
+
+        dfa_states = {0: 0, nfa.start: 1}
+        order = [0, nfa.start]
+        transitions = array('i')
+        transitions.extend([0] * n_classes)  # the dead state, unreachable when unanchored
+        state_bytes = n_classes * 4 + (nfa.n_states + 7) // 8 + STATE_OVERHEAD
+        i = 1
+        while i < len(order):
+            if deadline is not None and time.perf_counter() > deadline:
+                raise CompileLimitError(f"Subset construction ran out of time after {len(order) - 1} states",
+                                        'seconds', len(order) - 1)
+            step = nfa.step(order[i])
+            for class_id in range(n_classes):
+                next_states = step.get(class_id, 0) | restart
+                if next_states not in dfa_states:
+                    # the dead state is not counted
+                    if max_states is not None and len(order) > max_states:
+                        raise StateLimitError(f"DFA exceeds {max_states} states", len(order) - 1)
+                    dfa_states[next_states] = len(order)
+                    order.append(next_states)
+                    if max_bytes is not None and len(order) * state_bytes > max_bytes:
+                        raise CompileLimitError(f"DFA exceeds {max_bytes} bytes", 'memory_bytes',
+                                                len(order) * state_bytes)
+                transitions.append(dfa_states[next_states])
+            i += 1
+
+        labels = []
+        for states in order:
+            accepted = states & ends_mask
+            patterns = set()
+            while accepted:
+                lowest = accepted & -accepted
+                accepted ^= lowest
+                patterns.add(end_of[lowest.bit_length() - 1])
+            labels.append(frozenset(patterns))
+
+        accepting = bytearray(bool(label) for label in labels)
+        table = DFATable(nfa.alphabet, transitions, accepting, 1)
+        table, labels = HopcroftMinimizer(deadline).minimize_labeled(table, labels)
+        return cls(table, labels, unanchored)
+
+    def run(self, string: str) -> FrozenSet[int]:
+        '''
+            Unanchored: every regex accepted anywhere on the way, stopping once all regexes matched.
+            Anchored: the regexes accepted at the end of the string.
+        '''
+        table = self.table
+        transitions, accepting, n_classes = table.transitions, table.accepting, table.n_classes
+        classes, lookup, pattern_ids = table.alphabet.table, table.alphabet.lookup, self.pattern_ids
+        n_patterns, unanchored = self.n_patterns, self.unanchored
+
+        state = table.start
+        found = set(pattern_ids[state])
+        for char in string:
+            code = ord(char)
+            class_id = classes[code] if code < LATIN1_SIZE else lookup(char)
+            state = transitions[state * n_classes + class_id]
+            if state == table.DEAD_STATE:
+                return frozenset()
+            if unanchored and accepting[state]:
+                found.update(pattern_ids[state])
+                if len(found) == n_patterns:
+                    break
+        return frozenset(found) if unanchored else pattern_ids[state]
+
+
+class RegexSet:
+    '''
+        Matches a string against many regexes at once, in one pass over the string:
+            RegexSet(['error[0-9]+', 'warn', '(GET|POST)x']).matches('error42 GETx')  ->  [0, 2]
+    '''
+    _patterns: List[str]
+    _options: CompileOptions
+    _search_dfa: SetDFA = None
+    _fullmatch_dfa: SetDFA = None
+
+    _parser: RegexParser = RegexParser()
+
+    @classmethod
+    def set_parser(cls, parser: RegexParser):
+        cls._parser = parser
+
+    def __init__(self, patterns: List[str], options: CompileOptions = None):
+        self._patterns = list(patterns)
+        self._options = options if options is not None else CompileOptions()
+
+    @property
+    def patterns(self) -> List[str]:
+        return self._patterns
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def compile(self) -> Exception:
+        limits = self._options.limits
+        deadline = time.perf_counter() + limits.seconds if limits.seconds is not None else None
+        try:
+            NFA, ends = self._parser.parse_set_NFA(self._patterns, self._options)
+            nfa = CompactNFA(NFA)
+            search_dfa = SetDFA.from_nfa(nfa, ends, True, limits.dfa_states, limits.memory_bytes, deadline)
+            fullmatch_dfa = SetDFA.from_nfa(nfa, ends, False, limits.dfa_states, limits.memory_bytes, deadline)
+        except (ParserSyntaxError, CompileLimitError) as e:
+            return e
+        self._search_dfa, self._fullmatch_dfa = search_dfa, fullmatch_dfa
+
+    def _compiled(self) -> Tuple[SetDFA, SetDFA]:
+        if self._search_dfa is None:
+            err = self.compile()
+            if err: raise err
+        return self._search_dfa, self._fullmatch_dfa
+
+    # Ids (indexes into patterns) of the regexes that match anywhere in the string
+    def matches(self, string: str) -> List[int]:
+        search_dfa, _ = self._compiled()
+        return sorted(search_dfa.run(string))
+
+    def is_match(self, string: str) -> bool:
+        return bool(self.matches(string))
+
+    # Ids of the regexes that match the whole string
+    def fullmatches(self, string: str) -> List[int]:
+        _, fullmatch_dfa = self._compiled()
+        return sorted(fullmatch_dfa.run(string))
@@ -0,0 +1,143 @@
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from regex_ast import Node, Literal, CharSet, Concat, Alternate, Repeat, Group, CharRange, Span, fold
+
+
+class SimplifyReport(NamedTuple):
+    # Thompson NFA states of the pattern as written and after simplification
+    before: int
+    after: int
+
+    @property
+    def saved(self) -> int:
+        return self.before - self.after
+
+
+def _span(nodes: Sequence[Node]) -> Span:
+    return (min(node.span[0] for node in nodes), max(node.span[1] for node in nodes))
+
+
+def _merge_ranges(ranges: Sequence[CharRange]) -> Tuple[CharRange, ...]:
+    merged: List[CharRange] = []
+    for low, high in sorted(ranges):
+        if merged and ord(low) <= ord(merged[-1][1]) + 1:
+            if high > merged[-1][1]:
+                merged[-1] = (merged[-1][0], high)
+        else:
+            merged.append((low, high))
+    return tuple(merged)
+
+
+def _char_set(ranges: Sequence[CharRange], span: Span) -> Node:
+    ranges = _merge_ranges(ranges)
+    if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        return Literal(ranges[0][0], span)
+    return CharSet(ranges, span)
+
+
+def _ranges(node: Node) -> Tuple[CharRange, ...]:
+    return ((node.char, node.char),) if isinstance(node, Literal) else node.ranges
+
+
+def _sequence(node: Node) -> Tuple[Node, ...]:
+    return node.items if isinstance(node, Concat) else (node,)
+
+
+def _concat(items: Sequence[Node]) -> Node:
+    flat = tuple(item for node in items for item in _sequence(node))
+    return flat[0] if len(flat) == 1 else Concat(flat, _span(flat))
+
+
+def _alternate(items: Sequence[Node], span: Span) -> Node:
+    '''
+        Matches are leftmost-longest, so only the language of an alternation matters and
+        alternatives can be merged, dropped and reordered freely
+    '''
+    # dict keys keep the first of equal alternatives, in order
+    unique: Dict[Node, None] = {}
+    for item in items:
+        for alternative in (item.items if isinstance(item, Alternate) else (item,)):
+            unique.setdefault(alternative)
+
+    alternatives, chars = [], []
+    for alternative in _factor(list(unique)):
+        (chars if isinstance(alternative, (Literal, CharSet)) else alternatives).append(alternative)
+    if chars:
+        alternatives.insert(0, _char_set([r for char in chars for r in _ranges(char)], _span(chars)))
+    return alternatives[0] if len(alternatives) == 1 else Alternate(tuple(alternatives), span)
+
+
+def _factor(alternatives: List[Node]) -> List[Node]:
+    '''ab|ac|a -> a(b|c)?: alternatives with the same first item share it'''
+    groups: Dict[Node, List[Tuple[Node, ...]]] = {}
+    for alternative in alternatives:
+        sequence = _sequence(alternative)
+        groups.setdefault(sequence[0], []).append(sequence)
+
+    factored = []
+    for sequences in groups.values():
+        if len(sequences) == 1:
+            factored.append(_concat(sequences[0]))
+            continue
+        # longest prefix shared by the whole group
+        shared = 1
+        while all(len(sequence) > shared for sequence in sequences) \
+                and all(sequence[shared] == sequences[0][shared] for sequence in sequences):
+            shared += 1
+        prefix = sequences[0][:shared]
+        tails = [_concat(sequence[shared:]) for sequence in sequences if len(sequence) > shared]
+        optional = len(tails) < len(sequences)
+        if not tails:
+            factored.append(_concat(prefix))
+            continue
+        tail = _alternate(tails, _span(tails))
+        if optional:
+            tail = _repeat(tail, 0, 1, tail.span)
+        factored.append(_concat(prefix + (tail,)))
+    return factored
+
+
+# x{a,b} with a <= 1 and b >= 1, which a star repeats into x*
+def _repeats_itself(node: Node) -> bool:
+    return isinstance(node, Repeat) and node.min <= 1 and node.max != 0
+
+
+def _repeat(node: Node, low: int, high: Optional[int], span: Span) -> Node:
+    if (low, high) == (1, 1):
+        return node
+    # x{a,b}{c,d} repeats x between a*c and b*d times, without gaps as long as a <= 1
+    if isinstance(node, Repeat) and node.min <= 1 and node.max != 0 and high != 0:
+        inner_high = None if node.max is None or high is None else node.max * high
+        return _repeat(node.node, node.min * low, inner_high, span)
+    # (x*|y)* -> (x|y)*: under a star an alternative may repeat itself
+    if (low, high) == (0, None) and isinstance(node, Alternate) \
+            and any(_repeats_itself(item) for item in node.items):
+        items = [item.node if _repeats_itself(item) else item for item in node.items]
+        return _repeat(_alternate(items, node.span), low, high, span)
+    return Repeat(node, low, high, span)
+
+
+def _simplify(node: Node, items: List[Node]) -> Node:
+    if isinstance(node, CharSet):
+        return _char_set(node.ranges, node.span)
+    if isinstance(node, Concat):
+        return _concat(items)
+    if isinstance(node, Alternate):
+        return _alternate(items, node.span)
+    if isinstance(node, Repeat):
+        return _repeat(items[0], node.min, node.max, node.span)
+    if isinstance(node, Group):
+        # the language does not depend on groups, captures are found on the tree as parsed
+        return items[0]
+    return node
+
+
+def simplify(ast: Node) -> Node:
+    '''
+        Rewrites the tree bottom-up into one with the same language and a smaller Thompson NFA:
+            1. single characters and sets in an alternation become one set, ranges are merged
+            2. equal alternatives are dropped and common prefixes factored out: ab|ac -> a[bc]
+            3. nested repetitions collapse: (x*)* -> x*, (x?)+ -> x*, (x*|y)* -> (x|y)*
+            4. nested concatenations and alternations are flattened
+            5. capturing groups are dropped
+    '''
+    return fold(ast, _simplify)
@@ -0,0 +1,193 @@
+import codecs
+import mmap
+from typing import Iterator, List, Optional, Tuple, Union
+from dfa_table import DFATable
+
+Span = Tuple[int, int]
+Chunk = Union[str, bytes]
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+def iter_chunks(source, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Chunk]:
+    '''
+        Chunks of a str, of a bytes-like object (bytes, mmap, memoryview), of a file object
+        with a read method, or of an iterable of str/bytes chunks
+    '''
+    if isinstance(source, str):
+        for i in range(0, len(source), chunk_size):
+            yield source[i:i + chunk_size]
+    elif isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        view = memoryview(source)
+        for i in range(0, len(view), chunk_size):
+            yield view[i:i + chunk_size]
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk: return
+            yield chunk
+    else:
+        yield from source
+
+
+class StreamMatcher:
+    '''
+        Finds the leftmost-longest, non-overlapping matches of a DFA in input fed chunk by chunk,
+        with the same spans as DFATable.finditer on the concatenated input.
+
+        A thread is a DFA state and the offset where its match attempt started. Threads in the
+        same DFA state have the same future, so only the earliest one is kept and there are never
+        more threads than DFA states. No input is kept, except the characters read past the end
+        of the best match while trying to extend it: they are scanned again once the match is reported.
+
+        Offsets count characters of str chunks and bytes of bytes chunks.
+    '''
+    table: DFATable
+    # no match attempt starts at or after this offset, None for no limit
+    start_limit: Optional[int]
+
+    def __init__(self, table: DFATable, start_limit: Optional[int] = None):
+        self.table = table
+        self.start_limit = start_limit
+        # the start state only matters for classes that do not lead to the dead state
+        row = table.start * table.n_classes
+        self._starts_match = bytearray(table.transitions[row + c] != table.DEAD_STATE for c in range(table.n_classes))
+        # bytes.translate table marking classes that can start a match, used to skip ahead at C speed
+        self._start_marks = bytes(self._starts_match) + bytes(256 - table.n_classes) if table.n_classes <= 256 else None
+        self._offset = 0
+        # earliest offset where a new match attempt may start
+        self._resume = 0
+        # DFA state -> start offset, in increasing order of start
+        self._threads = {}
+        self._best: Optional[Span] = None
+        # class ids read since the end of the best match
+        self._pending = bytearray() if table.n_classes <= 256 else []
+
+    # True when the matches so far are final and no match attempt is running
+    @property
+    def idle(self) -> bool:
+        return not self._threads and self._best is None
+
+    @property
+    def offset(self) -> int:
+        return self._offset
+
+    def feed(self, chunk: Chunk) -> List[Span]:
+        spans = []
+        self._scan(self.table.alphabet.classify(chunk), spans)
+        return spans
+
+    # End of the input: report the match being extended and whatever follows it
+    def close(self) -> List[Span]:
+        spans = []
+        self._check_accepting()
+        while self._best is not None:
+            replay = self._emit(spans)
+            self._scan(replay, spans)
+            self._check_accepting()
+        return spans
+
+    def _check_accepting(self):
+        table, offset = self.table, self._offset
+        if self._best is None and offset >= self._resume and table.start not in self._threads \
+                and (self.start_limit is None or offset < self.start_limit):
+            self._threads[table.start] = offset
+        for state, start in self._threads.items():
+            if table.accepting[state]:
+                best = self._best
+                if best is None or start < best[0] or (start == best[0] and offset > best[1]):
+                    self._best = (start, offset)
+                    self._pending = self._pending[:0]
+        if self._best is not None:
+            best_start = self._best[0]
+            self._threads = {state: start for state, start in self._threads.items() if start <= best_start}
+
+    # Report the best match and return the input to scan again after it
+    def _emit(self, spans: List[Span]):
+        start, end = self._best
+        spans.append((start, end))
+        replay = self._pending
+        self._offset = end
+        if start == end:
+            # an empty match must not be reported twice at the same position
+            self._resume = end + 1
+        else:
+            self._resume = end
+        self._best = None
+        self._threads = {}
+        self._pending = replay[:0]
+        return replay
+
+    def _past_limit(self) -> bool:
+        return self.start_limit is not None and self._offset >= self.start_limit and self.idle
+
+    def _marks(self, classes) -> Optional[bytes]:
+        return bytes(classes).translate(self._start_marks) if self._start_marks is not None else None
+
+    def _scan(self, classes, spans: List[Span]):
+        table = self.table
+        transitions, n_classes, dead = table.transitions, table.n_classes, table.DEAD_STATE
+        starts_match, start_accepting = self._starts_match, table.accepting[table.start]
+
+        # input scanned again after a match is pushed on top of the rest of the chunk
+        stack = [(classes, 0, self._marks(classes))]
+        while stack:
+            classes, i, marks = stack.pop()
+            n = len(classes)
+            while i < n:
+                if self._past_limit():
+                    # no match can start any more, the rest of the input is skipped
+                    self._offset += n - i
+                    break
+                if not self._threads and self._best is None and self._offset >= self._resume and not start_accepting:
+                    # fast path: jump to the next class that can start a match
+                    if marks is not None:
+                        j = marks.find(1, i)
+                        j = n if j < 0 else j
+                    else:
+                        j = i
+                        while j < n and not starts_match[classes[j]]: j += 1
+                    self._offset += j - i
+                    i = j
+                    if i == n: break
+                class_id = classes[i]
+
+                self._check_accepting()
+                if not self._threads:
+                    if self._best is not None:
+                        stack.append((classes, i, marks))
+                        replay = self._emit(spans)
+                        stack.append((replay, 0, self._marks(replay)))
+                        break
+                    self._offset += 1
+                    i += 1
+                    continue
+
+                threads = {}
+                for state, start in self._threads.items():
+                    next_state = transitions[state * n_classes + class_id]
+                    if next_state != dead and next_state not in threads:
+                        threads[next_state] = start
+                self._threads = threads
+                if self._best is not None:
+                    self._pending.append(class_id)
+                self._offset += 1
+                i += 1
+
+
+def finditer_stream(table: DFATable, source, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    encoding: Optional[str] = None) -> Iterator[Span]:
+    '''
+        Spans of the matches in a stream, yielded as soon as they are known.
+        With an encoding, bytes are decoded incrementally and offsets count characters,
+        otherwise bytes are matched as Latin-1 and offsets count bytes.
+    '''
+    matcher = StreamMatcher(table)
+    decoder = codecs.getincrementaldecoder(encoding)() if encoding is not None else None
+    for chunk in iter_chunks(source, chunk_size):
+        if decoder is not None and not isinstance(chunk, str):
+            chunk = decoder.decode(bytes(chunk))
+        yield from matcher.feed(chunk)
+    if decoder is not None:
+        yield from matcher.feed(decoder.decode(b'', final=True))
+    yield from matcher.close()
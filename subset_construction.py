@@ -1,112 +1,99 @@
-from typing import Set
-from fsm import FSM, State
-from utils import set_to_string
+import time
+from array import array
+from typing import Dict, Optional
+from automaton import NFA
+from alphabet import Alphabet
+from compact_nfa import CompactNFA
+from dfa_table import DFATable
+from exceptions import CompileLimitError, StateLimitError
+
+# Estimated bytes of a DFA state besides its transition row: the dict entry and the int bitset header
+STATE_OVERHEAD = 100
 
 class SubsetConstruction:
-
-    def execute(self, NFA: FSM) -> FSM:
+    # Raise StateLimitError once the DFA has more states, None for no limit
+    max_states: Optional[int]
+    # Raise CompileLimitError once the estimated size of the DFA is larger, None for no limit
+    max_bytes: Optional[int]
+    # Raise CompileLimitError when time.perf_counter() passes it, None for no limit
+    deadline: Optional[float]
+    # NFA states whose moves the last execute combined, over all DFA states
+    nfa_states_visited: int
+    # epsilon closures the last execute computed (see CompactNFA)
+    n_closures: int
+    # DFA states (with the dead state) and their estimated bytes found by the last execute, also when it
+    # raised: a transition row and a bitset of NFA states per DFA state
+    n_states: int
+    estimated_bytes: int
+
+    def __init__(self, max_states: Optional[int] = None, max_bytes: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        self.max_states = max_states
+        self.max_bytes = max_bytes
+        self.deadline = deadline
+        self.n_states = 0
+        self.estimated_bytes = 0
+        self.nfa_states_visited = 0
+        self.n_closures = 0
+
+    def execute(self, nfa: NFA, alphabet: Alphabet = None) -> DFATable:
         '''
             algorithm for converting NFA to DFA (power set construction):
 
-                1. create a new start state and add it to the DFA states
-                    a. each state is a set of NFA states
-                    b. the start state is the epsilon closure of the start state of the NFA
-
-                2. add the epsilon closure of the new start state to the DFA states
-                    a. begin with epsilon closure of the start state of the NFA
+                1. split the moves of the NFA into disjoint symbol classes (CompactNFA)
+                    a. a set of NFA states is an int bitset, bit i is NFA state i
 
-                3. while there is an unmarked state in the DFA states:
-                    a. mark the state as visited.
+                2. precompute, once per NFA state, its epsilon closure and for each symbol class
+                   the epsilon closure of the states it moves to
+                    a. closures only keep states with a symbol move and acceptance states,
+                       the other states never make two DFA states behave differently
 
-                    b. for each possible action in the alphabet:
-                        i. find the epsilon closure of the union of the next states of the current state in the NFA for the action
-                        ii. if the closure is not in the DFA states, add it
-                        iii. add a transition from the current state to the closure
-                    
-                    c. repeat step 3 until all states are marked
+                3. the empty set is the dead state 0, the epsilon closure of the start state
+                   of the NFA is the start state
 
-                4. the acceptance states of the DFA are the states that contain an acceptance state of the NFA
-                    a. if a state contains an acceptance state of the NFA, it is an acceptance state of the DFA
+                4. for each DFA state, in the order they were found:
+                    a. for each symbol class, the next state is the union of the precomputed moves
+                       of its NFA states
+                        i. if the next state is not in the DFA states (a dict bitset -> state), add it
+                        ii. append it to the transition row of the current state
 
-                5. return the DFA          
+                5. the acceptance states of the DFA are the states that contain an acceptance state of the NFA
 
+            The number of DFA states can be exponential in the size of the NFA, so the state, memory
+            and time limits are checked as every state is added.
         '''
-        DFA = FSM()
-        start_state = State('start', self.epsilon_closure(NFA, NFA.initial_state))
-        # convert set of states to Frozenset to make it hashable
-        start_state.elements = frozenset(start_state.elements)
-        DFA.add_state(start_state)
-        DFA.initial_state = start_state
-
-        unmarked_states = [start_state]
-        # iterate over unmarked states
-        while unmarked_states:
-            current_state = unmarked_states.pop()
-            transition_table = {} # action -> next_states
-            # iterate over each action in each state
-            for state in current_state.elements:
-                for action in NFA.get_transitions(state).keys():
-                    if action == 'ε':
-                        continue
-
-                    next_states = set()
-                    for next_state in NFA.get_transitions(state)[action]:
-                        next_states |= self.epsilon_closure(NFA, next_state)
-                    next_states = frozenset(next_states)
-
-                    if action not in transition_table:
-                        transition_table[action] = next_states
-                    else:
-                        transition_table[action] |= next_states
-
-            # for each action in transition table make a new state if not already in DFA
-            for action, next_states in transition_table.items():
-                if not next_states:
-                    continue
-
-                next_state = State('S' + str(len(DFA._states)), next_states)
-                if next_state not in DFA._states:
-                    unmarked_states.append(next_state)
-                    DFA.add_state(next_state)
-                else:
-                    # if exist find the state
-                    for state in DFA._states.keys():
-                        if state == next_state:
-                            next_state = state
-                            break
-
-                DFA.add_transition(current_state, next_state, action)
-
-
-
-        # check for acceptance states    
-        for state in DFA._states.keys():
-            for nfa_state in state.elements:
-                if NFA.is_acceptance(nfa_state):
-                    DFA._acceptance_states.add(state)
-                    break
-
-        # rename states
-        for state in DFA._states.keys():
-            state.name = "S" + str(list(DFA._states.keys()).index(state))
-        
-
-        DFA.initial_state.name = "Start"
-
-        return DFA
-
-
-    def epsilon_closure(self, nfa: FSM,s: State) -> Set[State]:
-        eps = {s}
-        new_states = True
-        while new_states:
-            new_states = False
-            for state in eps.copy():
-                for action, next_states in nfa.get_transitions(state).items():
-                    if action == 'ε':
-                        for next_state in next_states:
-                            if next_state not in eps:
-                                new_states = True
-                            eps.add(next_state)
-        return eps
-
+        compact = CompactNFA(nfa, alphabet)
+        self.n_closures = compact.n_closures
+        self.nfa_states_visited = 0
+        n_classes = compact.alphabet.size
+        state_bytes = n_classes * 4 + (compact.n_states + 7) // 8 + STATE_OVERHEAD
+        self.n_states, self.estimated_bytes = 2, 2 * state_bytes
+        # the start set is never empty: it reaches the acceptance state or a symbol move
+        order = [0, compact.start]
+        dfa_states: Dict[int, int] = {0: DFATable.DEAD_STATE, compact.start: 1}
+        transitions = array('i')
+
+        i = 0
+        while i < len(order):
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise CompileLimitError(f"Subset construction ran out of time after {len(order) - 1} states",
+                                        'seconds', len(order) - 1)
+            row = array('i', [DFATable.DEAD_STATE]) * n_classes
+            self.nfa_states_visited += bin(order[i]).count('1')
+            for class_id, next_states in compact.step(order[i]).items():
+                if next_states not in dfa_states:
+                    # the dead state is not counted
+                    if self.max_states is not None and len(order) > self.max_states:
+                        raise StateLimitError(f"DFA exceeds {self.max_states} states", len(order) - 1)
+                    dfa_states[next_states] = len(order)
+                    order.append(next_states)
+                    self.n_states, self.estimated_bytes = len(order), len(order) * state_bytes
+                    if self.max_bytes is not None and self.estimated_bytes > self.max_bytes:
+                        raise CompileLimitError(f"DFA exceeds {self.max_bytes} bytes", 'memory_bytes',
+                                                self.estimated_bytes)
+                row[class_id] = dfa_states[next_states]
+            transitions.extend(row)
+            i += 1
+
+        accepting = bytearray(bool(states & compact.acceptance) for states in order)
+        return DFATable(compact.alphabet, transitions, accepting, dfa_states[compact.start])
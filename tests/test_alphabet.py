@@ -0,0 +1,17 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alphabet import LATIN1_SIZE, MAX_TRANSLATION_CACHE
+from regex_parser import RegexParser
+from options import CompileOptions
+
+
+def test_translation_table_is_bounded():
+    _, table, _ = RegexParser().compile('[a-z]+一', CompileOptions(engine='dfa'))
+    alphabet = table.alphabet
+    text = ''.join(chr(code) for code in range(0x4e00, 0x4e00 + 3 * MAX_TRANSLATION_CACHE))
+    classes = alphabet.classify(text)
+    assert list(classes) == [alphabet.lookup(char) for char in text]
+    assert len(alphabet._translation) <= LATIN1_SIZE + MAX_TRANSLATION_CACHE
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_parser import RegexParser
+from options import CompileOptions
+from async_match import aiter_chunks, afinditer_stream
+
+
+def test_stream_reader_is_read_in_chunks():
+    # one 200 KB line: reading a StreamReader by lines overflows its 64 KiB limit
+    body = (b'x' * 1000 + b'error42') * 200
+    _, table, _ = RegexParser().compile('error[0-9]+', CompileOptions(engine='dfa'))
+
+    async def scan():
+        reader = asyncio.StreamReader()
+        reader.feed_data(body)
+        reader.feed_eof()
+        return [span async for span in afinditer_stream(table, reader, chunk_size=1 << 12, encoding='ascii')]
+
+    spans = asyncio.run(scan())
+    assert len(spans) == 200
+    assert spans[0] == (1000, 1007)
+
+
+def test_chunks_of_a_stream_reader_respect_chunk_size():
+    async def chunks():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'a' * 200_000)
+        reader.feed_eof()
+        return [chunk async for chunk in aiter_chunks(reader, 1 << 12)]
+
+    sizes = [len(chunk) for chunk in asyncio.run(chunks())]
+    assert sum(sizes) == 200_000 and max(sizes) <= 1 << 12
+
+
+def test_stream_rejects_a_process_pool():
+    _, table, _ = RegexParser().compile('error[0-9]+', CompileOptions(engine='dfa'))
+
+    async def scan():
+        return [span async for span in afinditer_stream(table, [b'error42'], executor=ProcessPoolExecutor())]
+
+    with pytest.raises(ValueError):
+        asyncio.run(scan())
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_parser import RegexParser
+from options import CompileOptions
+from async_match import afinditer
+
+BOUNDS = [(0, None), (0, -1), (-2, None), (-1, None), (5, None), (1, 2), (2, 1), (5, 1), (-5, -5), (3, 100), (0, 0)]
+
+
+def _span(match):
+    return match.span() if match is not None else None
+
+
+@pytest.mark.parametrize('engine', ['dfa', 'lazy', 'pike', 'auto'])
+@pytest.mark.parametrize('pattern', ['[ab]', '[ab]*', 'c', 'bc|c'])
+@pytest.mark.parametrize('pos, endpos', BOUNDS)
+def test_pos_and_endpos_like_re(engine, pattern, pos, endpos):
+    _, compiled, _ = RegexParser().compile(pattern, CompileOptions(engine=engine))
+    expected = re.compile(pattern)
+    string = 'abc'
+    args = (string, pos) if endpos is None else (string, pos, endpos)
+    assert _span(compiled.match(*args)) == _span(expected.match(*args))
+    assert _span(compiled.fullmatch(*args)) == _span(expected.fullmatch(*args))
+    assert _span(compiled.search(*args)) == _span(expected.search(*args))
+    assert [m.span() for m in compiled.finditer(*args)] == [m.span() for m in expected.finditer(*args)]
+
+
+@pytest.mark.parametrize('pos, endpos', BOUNDS)
+def test_async_bounds_like_re(pos, endpos):
+    _, table, _ = RegexParser().compile('[ab]*', CompileOptions(engine='dfa'))
+    expected = re.compile('[ab]*')
+    string = 'abc'
+
+    async def spans():
+        return [m.span() async for m in afinditer(table, string, pos, endpos)]
+
+    found = asyncio.run(spans())
+    args = (string, pos) if endpos is None else (string, pos, endpos)
+    assert found == [m.span() for m in expected.finditer(*args)]
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex import Regex
+from regex_parser import RegexParser
+from options import CompileOptions, CompileLimits
+from exceptions import CompileLimitError
+
+
+@pytest.mark.parametrize('engine', ['dfa', 'lazy', 'pike'])
+def test_capture_automaton_obeys_the_nfa_limit(engine):
+    # about 200 states once the groups are dropped, 1600 with them
+    options = CompileOptions(engine=engine, limits=CompileLimits(nfa_states=1000))
+    _, compiled, _ = RegexParser().compile('(a|b){200}', options)
+    match = compiled.search('ab' * 100)
+    assert match.span() == (0, 200)
+    with pytest.raises(CompileLimitError) as error:
+        match.group(1)
+    assert error.value.limit == 'nfa_states'
+
+
+def test_capture_automaton_within_the_limits():
+    options = CompileOptions(limits=CompileLimits(nfa_states=1000, memory_bytes=1 << 20, seconds=5))
+    assert Regex('([a-z]+)([0-9]+)', options).search('id: abc123').groups() == ('abc', '123')
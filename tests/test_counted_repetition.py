@@ -0,0 +1,24 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import MAX_REPEAT
+from regex_parser import RegexParser
+
+
+# counts near MAX_REPEAT make DFAs of 1000 to 3000 states, a quadratic minimizer takes seconds on them
+@pytest.mark.parametrize('pattern, text', [
+    (f'a{{{MAX_REPEAT}}}', 'a' * MAX_REPEAT),
+    (f'(ab|cd){{{MAX_REPEAT}}}', 'ab' * MAX_REPEAT),
+    (f'[a-z]{{3,{MAX_REPEAT}}}', 'x' * MAX_REPEAT),
+])
+def test_long_counts_compile_fast(pattern, text):
+    started = time.perf_counter()
+    _, table, _ = RegexParser().compile(pattern)
+    assert time.perf_counter() - started < 1.0
+    assert table.fullmatch(text) is not None
+    assert table.fullmatch(text + text[-1]) is None
@@ -0,0 +1,35 @@
+import os
+import pickle
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_parser import RegexParser
+
+
+def test_prefilter_counts_are_exact_across_threads():
+    _, engine, _ = RegexParser().compile('error[0-9]+')
+    prefilter = engine.prefilter
+    text = 'errorx error42 ' * 500
+    list(engine.finditer(text))
+    candidates, hits = prefilter.candidates, prefilter.hits
+    assert hits == 500 and candidates >= hits
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda _: list(engine.finditer(text)), range(16)))
+    finally:
+        sys.setswitchinterval(interval)
+    assert (prefilter.candidates, prefilter.hits) == (17 * candidates, 17 * hits)
+
+
+def test_prefilter_pickles():
+    prefilter = RegexParser().prefilter('error[0-9]+')
+    prefilter.count(candidates=3, hits=2)
+    copy = pickle.loads(pickle.dumps(prefilter))
+    assert (copy.prefixes, copy.candidates, copy.hits) == (['error'], 3, 2)
+    copy.count(hits=1)
+    assert copy.hits == 3
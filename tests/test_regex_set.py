@@ -0,0 +1,27 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regex_set import RegexSet
+from options import CompileOptions, CompileLimits
+from exceptions import CompileLimitError, StateLimitError
+
+
+def test_set_respects_the_dfa_state_limit():
+    # the unanchored DFA doubles with every [ab]
+    limits = CompileLimits(dfa_states=100, seconds=0.5)
+    err = RegexSet(['a[ab]{14}'], CompileOptions(limits=limits)).compile()
+    assert isinstance(err, StateLimitError)
+    assert err.value <= 100
+
+
+def test_set_returns_nfa_limit_errors():
+    err = RegexSet(['a{1000}'], CompileOptions(limits=CompileLimits(nfa_states=100))).compile()
+    assert isinstance(err, CompileLimitError) and err.limit == 'nfa_states'
+
+
+def test_set_within_limits_matches():
+    rules = RegexSet(['error[0-9]+', 'warn'], CompileOptions(limits=CompileLimits(dfa_states=100)))
+    assert rules.compile() is None
+    assert rules.matches('warn error42') == [0, 1]
@@ -0,0 +1,77 @@
+import os
+import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dfa_table
+from regex_parser import RegexParser
+from options import CompileOptions
+
+
+class CountingStr(str):
+    '''A str that counts the characters an engine reads with string[i]'''
+    def __new__(cls, value: str):
+        string = super().__new__(cls, value)
+        string.reads = 0
+        return string
+
+    def __getitem__(self, index):
+        self.reads += 1
+        return str.__getitem__(self, index)
+
+
+# inputs where trying every start position reads every suffix of the text
+@pytest.mark.parametrize('pattern, text, span', [
+    ('[a-z]*x', 'a' * 8000 + '0x', (8001, 8002)),
+    ('[a-z]*error', 'b' * 8000 + '0error', (8001, 8006)),
+])
+@pytest.mark.parametrize('engine', ['dfa', 'lazy'])
+def test_search_is_linear_with_prefilter(pattern, text, span, engine):
+    _, compiled, _ = RegexParser().compile(pattern, CompileOptions(engine=engine))
+    assert compiled.prefilter is not None
+    string = CountingStr(text)
+    assert compiled.search(string).span() == span
+    assert string.reads <= 3 * len(text)
+
+
+@pytest.mark.parametrize('pattern', ['[a-z]*x', 'ab|abcd|c', '(a|b)*abb', 'x[0-9]*y|[0-9]+'])
+@pytest.mark.parametrize('engine', ['dfa', 'lazy'])
+def test_finditer_agrees_with_pike(pattern, engine):
+    parser = RegexParser()
+    _, compiled, _ = parser.compile(pattern, CompileOptions(engine=engine))
+    _, pike, _ = parser.compile(pattern, CompileOptions(engine='pike'))
+    text = 'abcd xx9y 0ab aabb abbb x123 abcabcd'
+    assert [m.span() for m in compiled.finditer(text)] == [m.span() for m in pike.finditer(text)]
+
+
+def test_reverse_dfa_has_a_state_budget():
+    # 19 forward states, but the reverse DFA doubles with every [ab]
+    _, table, metrics = RegexParser().compile('[ab]{16}a[ab]*', CompileOptions(engine='dfa'))
+    assert table.reverse is None
+    assert metrics.stage('reverse_subset_construction').counters['aborted'] == 1
+    text = 'c' + 'ab' * 20
+    assert table.search(text).span() == (1, len(text))
+
+
+@pytest.mark.parametrize('engine', ['dfa', 'lazy'])
+def test_concurrent_searches_share_the_caches(engine, monkeypatch):
+    # a few states, so the caches are flushed all the time
+    monkeypatch.setattr(dfa_table, 'MAX_SEARCH_STATES', 8)
+    options = CompileOptions(engine=engine, lazy_dfa_states=8)
+    _, compiled, _ = RegexParser().compile('[ab]*[ac][ab][ab][bc][ac]', options)
+    rng = random.Random(0)
+    texts = [''.join(rng.choice('abcd') for _ in range(2000)) for _ in range(8)]
+    expected = [[m.span() for m in compiled.finditer(text)] for text in texts]
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda text: [m.span() for m in compiled.finditer(text)], texts * 4))
+    finally:
+        sys.setswitchinterval(interval)
+    assert results == expected * 4
@@ -1,139 +1,209 @@
-from collections import deque
-from fsm import FSM, State
-from exceptions import ParserSyntaxError
+from typing import List, NamedTuple, Optional, Tuple
+from automaton import NFA, NFABuilder, Mark
+from exceptions import CompileLimitError
+from regex_ast import Node, Literal, CharSet, Concat, Alternate, Repeat, Group, CharRange, fold
+
+# NFA states no construction goes over, whatever the limits: nested counts such as ((a{1000}){1000}){1000}
+# would otherwise exhaust the memory before any other check runs
+MAX_NFA_STATES = 1 << 20
+
+
+class Fragment(NamedTuple):
+    '''A piece of the NFA under construction, its states and edges are the ones added to the builder since mark'''
+    initial: int
+    acceptance: int
+    mark: Mark
+
+
+# Thompson NFA states of a tree, known before building it
+def nfa_size(ast: Node) -> int:
+    return fold(ast, _size)
+
+def _size(node: Node, sizes: List[int]) -> int:
+    if isinstance(node, (Literal, CharSet)):
+        return 2
+    if isinstance(node, Concat):
+        return sum(sizes)
+    if isinstance(node, (Alternate, Group)):
+        return sum(sizes) + 2
+    if isinstance(node, Repeat):
+        size, = sizes
+        if node.max == 0:
+            return 2
+        # an upper bound: shared boundary states make counted copies smaller, and only
+        # an optional fragment ending on a group tag needs its own end state
+        if node.max is None:
+            return size * max(node.min, 1) + 2
+        return size * node.max + 2
+    raise TypeError(f"Unknown node {node!r}")
 
-EPSILON_MOVE = 'ε'
 
 class Thompson:
-    BINARY_OPERATORS = ('&', '|', '-')
-    UNARY_OPERATORS = ('*', '+', '?')
-    
-    _state_index = 0
-        
-    def construct_NFA(self, postfix: str) -> FSM:
-        NFA = FSM()
-        stack = deque()
-        
-        for symbol in postfix:
-            if symbol.isalnum():
-                NFA = self.base(symbol)
-            elif self.is_binary_operator(symbol):
-                if len(stack) < 2:
-                    raise ParserSyntaxError("Invalid Regex")
-                B = stack.pop()
-                A = stack.pop()
-                if symbol == '&':
-                    NFA = self.concat(A, B)
-                elif symbol == '|':
-                    NFA = self.union(A, B)
-                elif symbol == '-':
-                    NFA = self.range(A, B)
-            elif self.is_unary_operator(symbol):
-                if len(stack) < 1:
-                    raise ParserSyntaxError("Invalid Regex")
-                A = stack.pop()
-                if symbol == '*':
-                    NFA = self.kleene_star(A)
-                elif symbol == '+':
-                    NFA = self.kleene_plus(A) 
-                if symbol == '?':
-                    NFA = self.zero_or_one(A)         
-            stack.append(NFA)   
-            
-        return NFA           
-    
-    def is_binary_operator(self, symbol: str) -> bool:
-        return symbol in self.BINARY_OPERATORS
-    
-    def is_unary_operator(self, symbol: str) -> bool:
-        return symbol in self.UNARY_OPERATORS
-    
-    def base(self, symbol: str) -> FSM:
-        NFA = FSM()
+    '''
+        Thompson's construction over integer states. Every fragment is written into the same
+        NFABuilder, so combining fragments only adds epsilon moves and never copies states,
+        except for counted repetition, which copies the repeated fragment from the builder.
+        The epsilon moves out of a state are added in priority order, alternatives from left to right
+        and repetitions greedy, which is the order the capture engines follow.
+    '''
+    builder: NFABuilder
+    # Raise CompileLimitError before building an NFA with more states, at most MAX_NFA_STATES
+    max_states: int
+
+    def __init__(self, max_states: Optional[int] = None):
+        self.builder = NFABuilder()
+        self.max_states = min(max_states, MAX_NFA_STATES) if max_states is not None else MAX_NFA_STATES
+
+    def construct_NFA(self, ast: Node) -> NFA:
+        initial, acceptance, _ = self.fragment(ast)
+        return self.builder.build(initial, [acceptance])
+
+    # Builds the fragment bottom-up, every node from the fragments of its children
+    def fragment(self, ast: Node) -> Fragment:
+        size = self.builder.n_states + nfa_size(ast)
+        if size > self.max_states:
+            raise CompileLimitError(f"NFA would have about {size} states, more than {self.max_states}",
+                                    'nfa_states', size)
+        return fold(ast, self._construct)
+
+    def _construct(self, node: Node, fragments: List[Fragment]) -> Fragment:
+        if isinstance(node, Literal):
+            return self.base(node.char)
+        if isinstance(node, CharSet):
+            return self.char_set(node.ranges)
+        if isinstance(node, Concat):
+            return self.concat(*fragments)
+        if isinstance(node, Alternate):
+            return self.union(*fragments)
+        if isinstance(node, Repeat):
+            A, = fragments
+            if (node.min, node.max) == (0, None):
+                return self.kleene_star(A)
+            if (node.min, node.max) == (1, None):
+                return self.kleene_plus(A)
+            if (node.min, node.max) == (0, 1):
+                return self.zero_or_one(A)
+            return self.repeat(A, node.min, node.max)
+        if isinstance(node, Group):
+            return self.capture(fragments[0], node.index)
+        raise TypeError(f"Unknown node {node!r}")
+
+    def base(self, symbol: str) -> Fragment:
+        mark = self.builder.mark()
         source, destination = self.make_state(), self.make_state()
-        NFA.add_state(source)
-        NFA.add_state(destination)
-        NFA.initial_state = source
-        NFA.set_acceptance(destination)
-        NFA.add_transition(source, destination, symbol)
-        return NFA
-    
-    def concat(self, A: FSM, B: FSM) -> FSM:
-        NFA = FSM()
-        NFA.extend(A)
-        NFA.extend(B)
-        NFA.initial_state = A.initial_state
-        NFA.set_acceptance(B.acceptance_state)
-        NFA.add_transition(A.acceptance_state, B.initial_state, EPSILON_MOVE)
-        return NFA
-    
-    def union(self, A: FSM, B: FSM) -> FSM:
-        NFA = FSM()
-        NFA.extend(A)
-        NFA.extend(B)
-        
+        self.builder.add_move(source, destination, ord(symbol), ord(symbol))
+        return Fragment(source, destination, mark)
+
+    def concat(self, *fragments: Fragment) -> Fragment:
+        for A, B in zip(fragments, fragments[1:]):
+            self.builder.add_epsilon(A.acceptance, B.initial)
+        return Fragment(fragments[0].initial, fragments[-1].acceptance, fragments[0].mark)
+
+    def union(self, *fragments: Fragment) -> Fragment:
         initial, terminal = self.make_state(), self.make_state()
-        NFA.add_state(initial)
-        NFA.add_state(terminal)
-        NFA.initial_state = initial
-        NFA.set_acceptance(terminal)
-        
-        NFA.add_transition(initial, A.initial_state, EPSILON_MOVE)
-        NFA.add_transition(initial, B.initial_state, EPSILON_MOVE)
-        NFA.add_transition(A.acceptance_state, terminal, EPSILON_MOVE)
-        NFA.add_transition(B.acceptance_state, terminal, EPSILON_MOVE)
-        return NFA
-    
-    def kleene_plus(self, A: FSM) -> FSM:
-        NFA = FSM()
-        NFA.extend(A)
-        
+        for A in fragments:
+            self.builder.add_epsilon(initial, A.initial)
+            self.builder.add_epsilon(A.acceptance, terminal)
+        return Fragment(initial, terminal, fragments[0].mark)
+
+    def kleene_plus(self, A: Fragment) -> Fragment:
         initial, terminal = self.make_state(), self.make_state()
-        NFA.add_state(initial)
-        NFA.add_state(terminal)
-        NFA.initial_state = initial
-        NFA.set_acceptance(terminal)
-        
-        NFA.add_transition(initial, A.initial_state, EPSILON_MOVE)
-        NFA.add_transition(A.acceptance_state, terminal, EPSILON_MOVE)
-        NFA.add_transition(A.acceptance_state, initial, EPSILON_MOVE)
-
-        return NFA
-    
-    def kleene_star(self, A: FSM) -> FSM:
-        NFA = self.kleene_plus(A)
-        NFA.add_transition(NFA.initial_state, NFA.acceptance_state, EPSILON_MOVE)
-        return NFA
-    
-    def zero_or_one(self, A: FSM) -> FSM:
-        NFA = FSM()
-        NFA.extend(A)
-        
+        self.builder.add_epsilon(initial, A.initial)
+        self.builder.add_epsilon(A.acceptance, initial)
+        self.builder.add_epsilon(A.acceptance, terminal)
+        return Fragment(initial, terminal, A.mark)
+
+    def kleene_star(self, A: Fragment) -> Fragment:
+        star = self.kleene_plus(A)
+        self.builder.add_epsilon(star.initial, star.acceptance)
+        return star
+
+    def zero_or_one(self, A: Fragment) -> Fragment:
+        A = self._untagged_end(A)
+        initial = self.make_state()
+        self.builder.add_epsilon(initial, A.initial)
+        self.builder.add_epsilon(initial, A.acceptance)
+        return Fragment(initial, A.acceptance, A.mark)
+
+    # A fragment that can be skipped must not end on a group tag, skipping it would set the tag
+    def _untagged_end(self, A: Fragment) -> Fragment:
+        if A.acceptance not in self.builder.tags:
+            return A
+        terminal = self.make_state()
+        self.builder.add_epsilon(A.acceptance, terminal)
+        return Fragment(A.initial, terminal, A.mark)
+
+    # Capturing group: epsilon moves through a state tagged with each slot of the group
+    def capture(self, A: Fragment, index: int) -> Fragment:
+        initial, terminal = self.make_state(), self.make_state()
+        self.builder.tags[initial], self.builder.tags[terminal] = 2 * index, 2 * index + 1
+        self.builder.add_epsilon(initial, A.initial)
+        self.builder.add_epsilon(A.acceptance, terminal)
+        return Fragment(initial, terminal, A.mark)
+
+    def repeat(self, A: Fragment, low: int, high: Optional[int]) -> Fragment:
+        '''
+            Counted repetition A{low,high}, A{low,} when high is None:
+                1. A{0} matches only the empty string, A is dropped from the builder
+
+                2. copy A until there are high copies, or low - 1 without a maximum, and chain them.
+                   When nothing in A leads back to its initial state and neither end is a group tag,
+                   every copy starts at the acceptance state of the one before, one state per copy less
+                   and no epsilon move
+
+                3. A{low,}: one more copy, repeated by kleene_plus
+
+                4. A{low,high}: every copy from the low-th one on may end the match, x{1,3} is x(x(x)?)?
+
+            Like every other fragment, the result has no move out of its acceptance state.
+        '''
+        if high == 0:
+            self.builder.rollback(A.mark)
+            initial, terminal = self.make_state(), self.make_state()
+            self.builder.add_epsilon(initial, terminal)
+            return Fragment(initial, terminal, A.mark)
+        if high is None and low <= 1:
+            return self.kleene_star(A) if low == 0 else self.kleene_plus(A)
+
+        end = self.builder.mark()
+        tags = self.builder.tags
+        shared = (A.initial not in tags and A.acceptance not in tags
+                  and not self.builder.has_incoming(A.initial, A.mark, end))
+        copies = [A]
+        for _ in range((high if high is not None else low - 1) - 1):
+            previous = copies[-1]
+            initial, acceptance = self.builder.copy(A.mark, end, A.initial, A.acceptance,
+                                                    previous.acceptance if shared else None)
+            if not shared:
+                self.builder.add_epsilon(previous.acceptance, initial)
+            copies.append(Fragment(initial, acceptance, A.mark))
+
+        if high is not None and low < high:
+            copies[-1] = self._untagged_end(copies[-1])
+        last = copies[-1]
+        if high is None:
+            plus = self.kleene_plus(Fragment(*self.builder.copy(A.mark, end, A.initial, A.acceptance), A.mark))
+            self.builder.add_epsilon(last.acceptance, plus.initial)
+            return Fragment(A.initial, plus.acceptance, A.mark)
+        for copy in copies[max(low, 1) - 1:-1]:
+            self.builder.add_epsilon(copy.acceptance, last.acceptance)
+        if low > 0:
+            return Fragment(A.initial, last.acceptance, A.mark)
+        if shared:
+            self.builder.add_epsilon(A.initial, last.acceptance)
+            return Fragment(A.initial, last.acceptance, A.mark)
         initial = self.make_state()
-        NFA.add_state(initial)
-        NFA.initial_state = initial
-        NFA.set_acceptance(A.acceptance_state)
-        
-        NFA.add_transition(NFA.initial_state, NFA.acceptance_state, EPSILON_MOVE)
-        NFA.add_transition(NFA.initial_state, A.initial_state, EPSILON_MOVE)
-        return NFA
-    
-    def range(self, A: FSM, B: FSM):
-        start = next(iter(A.get_transitions(A.initial_state)))
-        end = next(iter(B.get_transitions(B.initial_state)))
-        
-        NFA = FSM()
+        self.builder.add_epsilon(initial, A.initial)
+        self.builder.add_epsilon(initial, last.acceptance)
+        return Fragment(initial, last.acceptance, A.mark)
+
+    # One move per range of the set, over code points
+    def char_set(self, ranges: Tuple[CharRange, ...]) -> Fragment:
+        mark = self.builder.mark()
         source, destination = self.make_state(), self.make_state()
-        NFA.add_state(source)
-        NFA.add_state(destination)
-        NFA.initial_state = source
-        NFA.set_acceptance(destination)
-        NFA.add_transition(source, destination, f'{start}-{end}')
-        return NFA
-        
-            
-    def make_state(self) -> State:
-        state = State(f'S{self._state_index}')
-        self._state_index += 1
-        return state
-    
\ No newline at end of file
+        for low, high in ranges:
+            self.builder.add_move(source, destination, ord(low), ord(high))
+        return Fragment(source, destination, mark)
+
+    def make_state(self) -> int:
+        return self.builder.add_state()